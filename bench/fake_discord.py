@@ -0,0 +1,99 @@
+import itertools
+
+# ------------- Fake Discord objects -------------
+# Just enough of discord.Interaction / Message for the bot's flows to run without a gateway.
+
+_ids = itertools.count(1)
+
+class FakeMessage:
+    def __init__(self, content=None, view=None):
+        self.id = next(_ids)
+        self.content = content
+        self.view = view
+        self.history = [content]
+
+    async def edit(self, content=None, view=None, **kwargs):
+        self.content = content
+        self.view = view
+        self.history.append(content)
+
+    async def delete(self):
+        pass
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, view=None, **kwargs):
+        message = FakeMessage(content, view)
+        self.sent.append(message)
+        return message
+
+class FakeUser:
+    def __init__(self, name):
+        self.id = next(_ids)
+        self.name = name
+        self.display_name = name
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_message(self, content=None, view=None, **kwargs):
+        self.done = True
+        self.interaction.original = FakeMessage(content, view)
+
+    async def edit_message(self, content=None, view=None, **kwargs):
+        self.done = True
+        self.interaction.message.content = content
+        self.interaction.message.view = view
+        self.interaction.message.history.append(content)
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, view=None, **kwargs):
+        message = FakeMessage(content, view)
+        if self.interaction.original is None:
+            self.interaction.original = message
+        return message
+
+class FakeInteraction:
+    def __init__(self, user, channel=None, message=None):
+        self.id = next(_ids)
+        self.user = user
+        self.channel = channel or FakeChannel()
+        self.guild_id = 1
+        self.message = message  # component interactions carry the message they came from
+        self.original = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def delete_original_response(self):
+        self.original = None
+
+    async def edit_original_response(self, content=None, view=None, **kwargs):
+        # After defer() on a component interaction this edits the message the component is on
+        message = self.original or self.message
+        if message is not None:
+            await message.edit(content=content, view=view)
+
+    def component(self, message):
+        # A follow-up component interaction from the same user on the same message
+        return FakeInteraction(self.user, self.channel, message)
+
+def select(view, *values):
+    # Pick the first Select in a view and pretend the user chose `values`
+    from discord.ui import Select
+    item = next(i for i in view.children if isinstance(i, Select))
+    item._values = [str(v) for v in values]
+    return item
+
+def button(view, label):
+    from discord.ui import Button
+    return next(i for i in view.children if isinstance(i, Button) and i.label == label)
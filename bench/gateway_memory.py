@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import tracemalloc
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ------------- Gateway memory benchmark -------------
+# Builds the bot the way load_config() does and feeds its connection state the events a large
+# guild produces, limited to what the gateway would send for the configured intents. Reports
+# the memory held by discord.py's caches and the bytes the gateway would have pushed. Offline.
+
+BOT_ID = 1
+GUILD_ID = 2
+TIMESTAMP = "2024-01-01T00:00:00.000000+00:00"
+
+def user(n):
+    return {"id": str(1000 + n), "username": f"user{n}", "global_name": f"User {n}",
+            "discriminator": "0", "avatar": "0123456789abcdef0123456789abcdef"}
+
+def member(n, roles):
+    return {"user": user(n), "roles": roles, "joined_at": TIMESTAMP, "nick": None,
+            "deaf": False, "mute": False, "flags": 0}
+
+def presence(n):
+    return {"user": {"id": str(1000 + n)}, "status": "online", "client_status": {"desktop": "online"},
+            "activities": [{"name": "Some Game", "type": 0, "created_at": 1700000000000}]}
+
+def message(n, channel_id, author):
+    return {"id": str(10_000_000 + n), "channel_id": channel_id, "guild_id": str(GUILD_ID),
+            "author": user(author), "member": {k: v for k, v in member(author, []).items() if k != "user"},
+            "content": "Has anyone seen the new episode yet? " * 3, "timestamp": TIMESTAMP,
+            "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [],
+            "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0}
+
+def guild(args, intents):
+    roles = [{"id": str(GUILD_ID if i == 0 else 500 + i), "name": "@everyone" if i == 0 else f"role{i}",
+              "permissions": "0", "position": i, "color": 0, "hoist": False, "managed": False,
+              "mentionable": False} for i in range(args.roles)]
+    channels = [{"id": str(100_000 + i), "type": 0, "name": f"channel-{i}", "position": i,
+                 "permission_overwrites": [], "nsfw": False, "parent_id": None} for i in range(args.channels)]
+    online = int(args.members * args.online)
+    bot_member = dict(member(0, []), user=dict(user(0), id=str(BOT_ID), bot=True))
+    data = {"id": str(GUILD_ID), "name": "Big server", "owner_id": str(BOT_ID), "member_count": args.members,
+            "large": True, "roles": roles, "channels": channels, "emojis": [], "stickers": [],
+            "features": [], "threads": [], "voice_states": [], "stage_instances": [],
+            "guild_scheduled_events": [], "premium_tier": 0, "preferred_locale": "en-US",
+            "members": [bot_member], "presences": []}
+    if intents.presences:
+        # Large guilds only carry the online members (with their presences) in GUILD_CREATE
+        data["members"] += [member(n, [roles[1 + n % (args.roles - 1)]["id"]]) for n in range(1, online + 1)]
+        data["presences"] = [presence(n) for n in range(1, online + 1)]
+    return data
+
+def gateway_events(args, intents):
+    # -> [(event, payload)] in the order the gateway would send them
+    data = guild(args, intents)
+    events = [("GUILD_CREATE", data)]
+    if intents.members:
+        # chunk_guilds_at_startup asks for every member
+        for start in range(1, args.members + 1, 1000):
+            chunk = [member(n, []) for n in range(start, min(start + 1000, args.members + 1))]
+            events.append(("GUILD_MEMBERS_CHUNK", {"guild_id": str(GUILD_ID), "members": chunk,
+                                                   "chunk_index": start // 1000, "chunk_count": -(-args.members // 1000)}))
+    if intents.presences:
+        events += [("PRESENCE_UPDATE", dict(presence(n % args.members + 1), guild_id=str(GUILD_ID)))
+                   for n in range(args.presence_updates)]
+    if intents.guild_messages:
+        channels = [c["id"] for c in data["channels"]]
+        events += [("MESSAGE_CREATE", message(n, channels[n % len(channels)], n % args.members + 1))
+                   for n in range(args.messages)]
+    return events
+
+def measure(r, options, args):
+    bot = r.build_bot(options)
+    state = bot._connection
+    state.dispatch = lambda *a, **kw: None  # nothing is listening; only the caches matter here
+    state.user = discord.ClientUser(state=state, data=dict(user(0), id=str(BOT_ID), bot=True))
+    events = gateway_events(args, state.intents)
+    sent = sum(len(json.dumps(payload)) for _, payload in events)
+
+    tracemalloc.start()
+    for event, payload in events:
+        if event == "GUILD_CREATE":
+            state._get_create_guild(payload)
+        elif event == "GUILD_MEMBERS_CHUNK":
+            # What the chunk request started by chunk_guilds_at_startup does with each batch
+            g = state._get_guild(GUILD_ID)
+            for data in payload["members"]:
+                g._add_member(discord.Member(guild=g, data=data, state=state))
+        else:
+            getattr(state, f"parse_{event.lower()}")(payload)
+    del events
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    g = bot.get_guild(GUILD_ID)
+    return {"held": held, "sent": sent, "members": len(g.members), "users": len(bot.users),
+            "messages": len(bot.cached_messages)}
+
+async def run(args):
+    import regrabarr as r
+    logging.getLogger().setLevel(logging.WARNING)
+    modes = [("all", {"intents": "all"}), ("minimal", {"intents": "minimal"})]
+    print(f"Guild with {args.members} members ({args.online:.0%} online), {args.presence_updates} presence "
+          f"updates, {args.messages} messages\n")
+    print(f"{'intents':<18}{'cache KB':>10}{'gateway KB':>12}{'members':>10}{'users':>8}{'messages':>10}")
+    for name, options in modes:
+        m = measure(r, options, args)
+        print(f"{name:<18}{m['held'] / 1024:>10.0f}{m['sent'] / 1024:>12.0f}{m['members']:>10}"
+              f"{m['users']:>8}{m['messages']:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare discord.py cache memory across the bot's intent modes")
+    parser.add_argument("--members", type=int, default=50000)
+    parser.add_argument("--online", type=float, default=0.2, help="share of members online")
+    parser.add_argument("--presence-updates", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--roles", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
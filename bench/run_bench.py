@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_arr import start_stub
+from fake_discord import FakeUser, FakeInteraction, select, button
+
+# ------------- Benchmark -------------
+# Drives the real slash commands, selectors and confirm buttons against the stub
+# Radarr/Sonarr with N concurrent fake users. Runs fully offline.
+
+def write_config(base_url, args):
+    def instances(app):
+        # --instances N points N instances at the same stub to exercise the fan-out
+        return [{
+            "name": f"{app}{i + 1}" if args.instances > 1 else app,
+            "api_key": "bench", "url": f"{base_url}/{app}/api/v3",
+            "qualityprofileid": 1, "root_path": "/media",
+            "regrab_cooldown": 0, "requests_per_second": 0, "regrab_concurrency": args.concurrency,
+        } for i in range(args.instances)]
+    config = {"bot": {"token": "bench", "snapshot": False},  # every run starts cold
+              "radarr": instances("radarr"), "sonarr": instances("sonarr")}
+    fd, path = tempfile.mkstemp(prefix="regrabarr-bench-", suffix=".yml")
+    with os.fdopen(fd, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.failures = 0
+        self.wrong = 0  # flows that reported success but didn't delete and search what was picked
+
+    def add(self, name, seconds):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def report(self, wall):
+        flows = len(self.samples.get("movie total", [])) + len(self.samples.get("episode total", []))
+        print(f"{'step':<26}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name in sorted(self.samples):
+            s = self.samples[name]
+            print(f"{name:<26}{len(s):>7}{percentile(s, 50) * 1000:>10.1f}{percentile(s, 95) * 1000:>10.1f}"
+                  f"{percentile(s, 99) * 1000:>10.1f}{max(s) * 1000:>10.1f}")
+        print(f"\n{flows} flows in {wall:.2f}s -> {flows / wall:.1f} flows/s, {self.failures} failed"
+              f"{f' ({self.wrong} with wrong upstream calls)' if self.wrong else ''}")
+
+def searched(app, name, field):
+    return {i for c in app["library"].commands.values() if c["name"] == name for i in c["body"].get(field, [])}
+
+def check_movie(app, media_info):
+    # The picked movie's file was deleted and a MoviesSearch covered it (possibly one merged with another user's)
+    library = app["library"]
+    movie = next((m for m in library.movies.values() if m["tmdbId"] == media_info["movie"].tmdb_id), None)
+    if movie is None:
+        return False
+    file_id = (movie.get("movieFile") or {}).get("id")
+    return (movie["id"] in searched(app, "MoviesSearch", "movieIds")
+            and (not file_id or file_id in app["stats"]["deleted"]["moviefile"]))
+
+def check_episodes(app, media_info):
+    episodes = media_info["episodes"]
+    file_ids = {ep.episode_file_id for ep in episodes if ep.episode_file_id}
+    return ({ep.id for ep in episodes} <= searched(app, "EpisodeSearch", "episodeIds")
+            and file_ids <= app["stats"]["deleted"]["episodefile"])
+
+def verify(rec, app, status, check, media_info):
+    if status.startswith("❌"):
+        rec.failures += 1
+    elif not check(app, media_info):
+        rec.failures += 1
+        rec.wrong += 1
+        logging.error(f"Upstream calls don't match the regrab: {status}")
+
+async def think(args):
+    # A user reading the menu before clicking; not counted in the step timings
+    if args.think_ms:
+        await asyncio.sleep(args.think_ms / 1000)
+
+async def movie_flow(r, app, user, term, rec, args):
+    ctx = FakeInteraction(user)
+    start = time.perf_counter()
+    await r.regrab_movie(ctx, movie=term)
+    message = ctx.original
+    if message is None or message.view is None:
+        rec.failures += 1
+        return
+    results = time.perf_counter() - start
+    await think(args)
+    t = time.perf_counter()
+    await select(message.view, 0).callback(ctx.component(message))
+    confirm = time.perf_counter() - t
+    await think(args)
+    t = time.perf_counter()
+    click = ctx.component(message)
+    media_info = message.view.media_info
+    await button(message.view, "Regrab").callback(click)
+    regrab = time.perf_counter() - t
+    status = click.channel.sent[-1].content if click.channel.sent else ""
+    verify(rec, app, status, check_movie, media_info)
+    rec.add("movie results", results)
+    rec.add("movie confirm", confirm)
+    rec.add("movie regrab", regrab)
+    rec.add("movie total", results + confirm + regrab)
+
+async def episode_flow(r, app, user, term, rec, args, whole_season):
+    ctx = FakeInteraction(user)
+    start = time.perf_counter()
+    await r.regrab_episode(ctx, series=term)
+    message = ctx.original
+    if message is None or message.view is None:
+        rec.failures += 1
+        return
+    steps = {"results": time.perf_counter() - start}
+    for step, value in (("seasons", 0), ("episodes", 0), ("confirm", "all" if whole_season else 1)):
+        await think(args)
+        t = time.perf_counter()
+        await select(message.view, value).callback(ctx.component(message))
+        steps[step] = time.perf_counter() - t
+        if message.view is None:  # no aired episodes in that season
+            rec.failures += 1
+            return
+    await think(args)
+    t = time.perf_counter()
+    click = ctx.component(message)
+    media_info = message.view.media_info
+    await button(message.view, "Regrab").callback(click)
+    steps["regrab"] = time.perf_counter() - t
+    status = click.channel.sent[-1].content if click.channel.sent else ""
+    verify(rec, app, status, check_episodes, media_info)
+    for step, seconds in steps.items():
+        rec.add(f"episode {step}", seconds)
+    rec.add("episode total", sum(steps.values()))
+
+async def autocomplete_bench(r, titles, rec, rounds=200):
+    for _ in range(rounds):
+        prefix = random.choice(titles)[:random.randint(2, 8)]
+        start = time.perf_counter()
+        await r.movie_autocomplete(None, prefix)
+        rec.add("autocomplete", time.perf_counter() - start)
+
+async def user_loop(r, app, n, args, movie_titles, series_titles, rec):
+    user = FakeUser(f"user{n}")
+    for i in range(args.iterations):
+        flow = args.flow if args.flow != "mixed" else ("movie" if (n + i) % 2 else "episode")
+        try:
+            if flow == "movie":
+                await movie_flow(r, app, user, random.choice(movie_titles), rec, args)
+            else:
+                await episode_flow(r, app, user, random.choice(series_titles), rec, args, whole_season=bool(i % 2))
+        except Exception as e:
+            rec.failures += 1
+            logging.exception(f"{flow} flow failed: {e}")
+
+async def run(args):
+    runner, app, base_url = await start_stub(movies=args.movies, series=args.series,
+                                             latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000)
+    config_path = write_config(base_url, args)
+    import regrabarr as r
+    r.load_config(config_path)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    library = app["library"]
+    movie_titles = [m["title"] for m in library.movies.values()]
+    series_titles = [s["title"] for s in library.series.values()]
+
+    instances = list(r.arr_instances.values())
+    for inst in instances:
+        inst.queue.start()
+    warm = time.perf_counter()
+    await asyncio.gather(*(inst.index.refresh() for inst in instances))
+    print(f"Indexes warmed in {(time.perf_counter() - warm) * 1000:.0f} ms "
+          f"({', '.join(f'{inst.name}: {len(inst.index)}' for inst in instances)})")
+
+    rec = Recorder()
+    await autocomplete_bench(r, movie_titles, rec)
+    requests_before = app["stats"]["requests"]
+    start = time.perf_counter()
+    await asyncio.gather(*(user_loop(r, app, n, args, movie_titles, series_titles, rec) for n in range(args.users)))
+    wall = time.perf_counter() - start
+
+    print(f"{args.users} users x {args.iterations} flows ({args.flow}), "
+          f"stub latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"{app['stats']['requests'] - requests_before} upstream requests\n")
+    rec.report(wall)
+
+    for inst in instances:
+        await inst.queue.stop()
+    await r.close_http_sessions()
+    await runner.cleanup()
+    os.unlink(config_path)
+    return rec.failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the regrab flows against a stub Radarr/Sonarr")
+    parser.add_argument("--users", type=int, default=20, help="concurrent fake Discord users")
+    parser.add_argument("--iterations", type=int, default=5, help="flows per user")
+    parser.add_argument("--flow", choices=("movie", "episode", "mixed"), default="mixed")
+    parser.add_argument("--movies", type=int, default=2000, help="stub Radarr library size")
+    parser.add_argument("--series", type=int, default=500, help="stub Sonarr library size")
+    parser.add_argument("--latency-ms", type=float, default=50, help="stub latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between menu clicks, like a real user")
+    parser.add_argument("--concurrency", type=int, default=4, help="regrab workers per instance")
+    parser.add_argument("--instances", type=int, default=1, help="Radarr/Sonarr instances per app")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    sys.exit(1 if asyncio.run(run(args)) else 0)
+
+if __name__ == "__main__":
+    main()
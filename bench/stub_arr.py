@@ -0,0 +1,354 @@
+import sys
+import time
+import random
+import asyncio
+import argparse
+import aiohttp
+from aiohttp import web
+
+# ------------- Stub Radarr/Sonarr -------------
+# One aiohttp app serving both APIs under /radarr/api/v3 and /sonarr/api/v3, with a
+# generated library and per-request latency. Payloads carry the same bulky fields
+# (images, ratings, alternate titles) as the real thing so parsing costs are realistic.
+
+WORDS = ("the dark last night lost city star river king house blue road war moon fire "
+         "ghost secret winter summer black white iron golden silent broken wild empire").split()
+
+def make_title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+
+def images(kind, ident):
+    return [{"coverType": cover, "url": f"/MediaCover/{kind}/{ident}/{cover}.jpg",
+             "remoteUrl": f"https://image.tmdb.org/t/p/original/{ident}{cover}.jpg"}
+            for cover in ("poster", "fanart", "banner")]
+
+class StubLibrary:
+    def __init__(self, movies=2000, series=500, seed=1):
+        rng = random.Random(seed)
+        self.movies = {}
+        for i in range(1, movies + 1):
+            self.movies[i] = {
+                "id": i,
+                "tmdbId": 1000 + i,
+                "title": make_title(rng),
+                "year": rng.randint(1950, 2024),
+                "titleSlug": f"movie-{i}",
+                "overview": "A stub overview. " * rng.randint(5, 20),
+                "monitored": i % 31 != 0,  # a few unmonitored, which a regrab must monitor rather than re-add
+                "hasFile": True,
+                "cutoffNotMet": i % 23 == 0,  # a few below cutoff for the sweep
+                "movieFile": {"id": 50000 + i, "relativePath": f"movie-{i}.mkv", "size": 4_000_000_000},
+                "images": images("movie", i),
+                "ratings": {"imdb": {"votes": rng.randint(10, 10000), "value": 6.5}, "tmdb": {"votes": 100, "value": 7.0}},
+                "alternateTitles": [{"title": make_title(rng), "sourceType": "tmdb"} for _ in range(rng.randint(0, 6))],
+                "genres": ["Drama", "Action"],
+            }
+        self.series = {}
+        self.episodes = {}
+        episode_id = 1
+        for i in range(1, series + 1):
+            seasons = rng.randint(1, 8)
+            self.series[i] = {
+                "id": i,
+                "tvdbId": 70000 + i,
+                "title": make_title(rng),
+                "year": rng.randint(1980, 2024),
+                "titleSlug": f"series-{i}",
+                "overview": "A stub series overview. " * rng.randint(5, 20),
+                "monitored": True,
+                "seasons": [{"seasonNumber": n, "monitored": True} for n in range(0, seasons + 1)],
+                "images": images("series", i),
+                "ratings": {"votes": 100, "value": 8.0},
+                "alternateTitles": [{"title": make_title(rng)} for _ in range(rng.randint(0, 4))],
+            }
+            for season in range(1, seasons + 1):
+                for number in range(1, rng.randint(6, 24) + 1):
+                    self.episodes[episode_id] = {
+                        "id": episode_id,
+                        "seriesId": i,
+                        "seasonNumber": season,
+                        "episodeNumber": number,
+                        "title": make_title(rng),
+                        "airDate": f"{2000 + season}-01-{min(number, 28):02d}",
+                        "overview": "An episode. " * 10,
+                        "hasFile": episode_id % 37 != 0,  # a few missing for the sweep
+                        "cutoffNotMet": episode_id % 41 == 0,
+                        "episodeFileId": 900000 + episode_id if episode_id % 37 else 0,
+                        "monitored": True,
+                    }
+                    episode_id += 1
+        self.commands = {}
+        self.next_command = 1
+        # Seconds after a search command is posted: it starts, completes, and what it grabbed reaches /queue
+        # (only after the tracked-download refresh, like the real thing) and finishes downloading
+        self.timings = {"started": 0.5, "completed": 2, "queued": 4, "downloaded": 8}
+        self.grabs = True  # False: searches find nothing
+
+    def lookup(self, items, term, limit=20):
+        term = (term or "").lower()
+        kind, _, ident = term.partition(":")
+        if kind in ("tmdb", "tvdb") and ident.isdigit():
+            # "tmdb:603" / "tvdb:81189" look up one exact item
+            key = "tmdbId" if kind == "tmdb" else "tvdbId"
+            return [dict((k, v) for k, v in m.items() if k != "id") for m in items.values() if m.get(key) == int(ident)]
+        words = term.split()
+        hits = [m for m in items.values() if all(w in m["title"].lower() for w in words)]
+        if not hits:
+            # TMDB/TVDB would still return something; keep the menus populated
+            hits = list(items.values())[:limit]
+        out = []
+        for m in hits[:limit]:
+            item = dict(m)
+            item.pop("id", None)  # lookups of missing items carry no *arr id
+            out.append(item)
+        return out
+
+    def command(self, body):
+        command_id = self.next_command
+        self.next_command += 1
+        self.commands[command_id] = {"id": command_id, "name": body.get("name"), "body": body,
+                                     "queued": time.monotonic()}
+        return self.command_state(self.commands[command_id])
+
+    def command_state(self, command):
+        age = time.monotonic() - command["queued"]
+        status = "queued" if age < self.timings["started"] else "started" if age < self.timings["completed"] else "completed"
+        state = {"id": command["id"], "name": command["name"], "status": status}
+        if status == "completed":
+            state["message"] = f"Search completed. {len(self.searched_ids(command))} reports downloaded."
+        return state
+
+    def searched_ids(self, command):
+        body = command["body"]
+        return body.get("movieIds") or body.get("episodeIds") or [] if self.grabs else []
+
+    def queued_grabs(self, id_field):
+        # Queue entries for what recent searches grabbed, half downloaded
+        now = time.monotonic()
+        entries = []
+        for command in self.commands.values():
+            age = now - command["queued"]
+            if self.timings["queued"] <= age < self.timings["downloaded"]:
+                entries += [{"id": 100000 + command["id"] * 1000 + n, id_field: item_id, "size": 1000, "sizeleft": 500,
+                             "trackedDownloadStatus": "ok", "trackedDownloadState": "downloading"}
+                            for n, item_id in enumerate(self.searched_ids(command))
+                            if (id_field == "movieId") == (command["name"] == "MoviesSearch")]
+        return entries
+
+# ------------- Webhook sender -------------
+# What Radarr/Sonarr POST to a "Webhook" connection, trimmed to the fields the bot reads plus a few
+# it doesn't, for driving /webhook/<instance> without a real *arr.
+
+WEBHOOK_EVENTS = ("Grab", "Download", "ImportFailed", "DownloadFailed", "ManualInteractionRequired", "Test")
+
+def webhook_payload(library, app, event, item_ids):
+    payload = {"eventType": event, "instanceName": app.title(), "downloadId": "SABnzbd_nzo_stub"}
+    if event in ("ImportFailed", "DownloadFailed", "ManualInteractionRequired"):
+        payload["message"] = f"{event}: stub failure"
+    if app == "radarr":
+        movie = library.movies[item_ids[0]]
+        payload["movie"] = {"id": movie["id"], "title": movie["title"], "year": movie["year"], "tmdbId": movie["tmdbId"]}
+        payload["remoteMovie"] = {"title": movie["title"], "year": movie["year"], "tmdbId": movie["tmdbId"]}
+    else:
+        episodes = [library.episodes[i] for i in item_ids]
+        series = library.series[episodes[0]["seriesId"]]
+        payload["series"] = {"id": series["id"], "title": series["title"], "tvdbId": series["tvdbId"]}
+        payload["episodes"] = [{"id": e["id"], "seasonNumber": e["seasonNumber"], "episodeNumber": e["episodeNumber"],
+                                "title": e["title"]} for e in episodes]
+    if event in ("Grab", "Download"):
+        payload["release"] = {"quality": "Bluray-1080p", "releaseTitle": "Stub.Release.1080p", "size": 4_000_000_000}
+    return payload
+
+async def send_webhook(url, payload, token=None):
+    # -> HTTP status; the token goes in as the webhook password, like the *arr UI sends it
+    headers = {"Authorization": aiohttp.BasicAuth("", token).encode()} if token else None
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=payload, headers=headers) as resp:
+            return resp.status
+
+def build_app(library, latency=0.0, jitter=0.0):
+    # deleted: ids per kind ("movie", "moviefile", "episodefile"), so a harness can check what a regrab did
+    stats = {"requests": 0, "deleted": {"movie": set(), "moviefile": set(), "episodefile": set()}}
+
+    @web.middleware
+    async def delay(request, handler):
+        stats["requests"] += 1
+        if latency or jitter:
+            await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+        return await handler(request)
+
+    app = web.Application(middlewares=[delay])
+    app["stats"] = stats
+    app["library"] = library
+
+    async def profiles(request):
+        return web.json_response([{"id": 1, "name": "Any"}])
+
+    async def root_folders(request):
+        return web.json_response([{"id": 1, "path": "/media"}])
+
+    async def empty_list(request):
+        return web.json_response([])
+
+    async def radarr_queue(request):
+        # One download stuck on import, for the sweep
+        stuck = [{"id": 1, "movieId": 2, "trackedDownloadStatus": "warning",
+                  "trackedDownloadState": "importBlocked"}] if 2 in library.movies else []
+        return web.json_response(stuck + library.queued_grabs("movieId"))
+
+    async def sonarr_queue(request):
+        failed = [{"id": 1, "episodeId": 2, "seriesId": library.episodes[2]["seriesId"],
+                   "trackedDownloadStatus": "error", "trackedDownloadState": "failed"}] if 2 in library.episodes else []
+        return web.json_response(failed + library.queued_grabs("episodeId"))
+
+    def paged(request, records):
+        page, size = int(request.query.get("page", 1)), int(request.query.get("pageSize", 10))
+        return web.json_response({"page": page, "pageSize": size, "totalRecords": len(records),
+                                  "records": records[(page - 1) * size:page * size]})
+
+    def wanted(items, kind):
+        if kind == "missing":
+            return [i for i in items if i["monitored"] and not i["hasFile"]]
+        return [i for i in items if i["monitored"] and i["hasFile"] and i.get("cutoffNotMet")]
+
+    async def commands(request):
+        return web.json_response([library.command_state(c) for c in library.commands.values()])
+
+    async def post_command(request):
+        return web.json_response(library.command(await request.json()), status=201)
+
+    # Radarr
+    async def movie_lookup(request):
+        return web.json_response(library.lookup(library.movies, request.query.get("term")))
+
+    async def movies(request):
+        tmdb_id = request.query.get("tmdbId")
+        if tmdb_id:
+            return web.json_response([m for m in library.movies.values() if m["tmdbId"] == int(tmdb_id)])
+        return web.json_response(list(library.movies.values()))
+
+    async def add_movie(request):
+        body = await request.json()
+        movie_id = max(library.movies, default=0) + 1
+        library.movies[movie_id] = dict(body, id=movie_id, hasFile=False)
+        return web.json_response(library.movies[movie_id], status=201)
+
+    async def movie_editor(request):
+        body = await request.json()
+        for movie_id in body["movieIds"]:
+            library.movies[movie_id]["monitored"] = body.get("monitored", library.movies[movie_id]["monitored"])
+        return web.json_response([library.movies[i] for i in body["movieIds"]], status=202)
+
+    async def delete_movie(request):
+        movie_id = int(request.match_info["id"])
+        stats["deleted"]["movie"].add(movie_id)
+        library.movies.pop(movie_id, None)
+        return web.json_response({})
+
+    def delete_files(kind):
+        async def handler(request):
+            if "id" in request.match_info:
+                stats["deleted"][kind].add(int(request.match_info["id"]))
+            else:
+                stats["deleted"][kind].update((await request.json())[f"{kind[:-4]}FileIds"])
+            return web.json_response({})
+        return handler
+
+    # Sonarr
+    async def series_lookup(request):
+        return web.json_response(library.lookup(library.series, request.query.get("term")))
+
+    async def series(request):
+        tvdb_id = request.query.get("tvdbId")
+        if tvdb_id:
+            return web.json_response([s for s in library.series.values() if s["tvdbId"] == int(tvdb_id)])
+        return web.json_response(list(library.series.values()))
+
+    async def add_series(request):
+        body = await request.json()
+        series_id = max(library.series, default=0) + 1
+        library.series[series_id] = dict(body, id=series_id, seasons=[{"seasonNumber": 1}])
+        return web.json_response(library.series[series_id], status=201)
+
+    async def episodes(request):
+        series_id = int(request.query["seriesId"])
+        season = request.query.get("seasonNumber")
+        return web.json_response([e for e in library.episodes.values() if e["seriesId"] == series_id
+                                  and (season is None or e["seasonNumber"] == int(season))])
+
+    async def episode(request):
+        ep = library.episodes.get(int(request.match_info["id"]))
+        if ep is None:
+            return web.json_response({"message": "NotFound"}, status=404)
+        return web.json_response(ep)
+
+    for app_name in ("radarr", "sonarr"):
+        base = f"/{app_name}/api/v3"
+        app.router.add_get(f"{base}/qualityprofile", profiles)
+        app.router.add_get(f"{base}/rootfolder", root_folders)
+        app.router.add_get(f"{base}/command", commands)
+        app.router.add_post(f"{base}/command", post_command)
+        app.router.add_post(f"{base}/command/", post_command)
+
+    async def radarr_wanted(request):
+        return paged(request, wanted(list(library.movies.values()), request.match_info["kind"]))
+
+    async def sonarr_wanted(request):
+        return paged(request, wanted(list(library.episodes.values()), request.match_info["kind"]))
+
+    app.router.add_get("/radarr/api/v3/queue/details", radarr_queue)
+    app.router.add_get("/sonarr/api/v3/queue/details", sonarr_queue)
+    app.router.add_get("/radarr/api/v3/wanted/{kind}", radarr_wanted)
+    app.router.add_get("/sonarr/api/v3/wanted/{kind}", sonarr_wanted)
+    app.router.add_get("/radarr/api/v3/movie/lookup", movie_lookup)
+    app.router.add_get("/radarr/api/v3/movie", movies)
+    app.router.add_post("/radarr/api/v3/movie", add_movie)
+    app.router.add_put("/radarr/api/v3/movie/editor", movie_editor)
+    app.router.add_delete("/radarr/api/v3/movie/{id}", delete_movie)
+    app.router.add_delete("/radarr/api/v3/moviefile/bulk", delete_files("moviefile"))
+    app.router.add_delete("/radarr/api/v3/moviefile/{id}", delete_files("moviefile"))
+
+    app.router.add_get("/sonarr/api/v3/series/lookup", series_lookup)
+    app.router.add_get("/sonarr/api/v3/series", series)
+    app.router.add_post("/sonarr/api/v3/series", add_series)
+    app.router.add_get("/sonarr/api/v3/episode", episodes)
+    app.router.add_get("/sonarr/api/v3/episode/{id}", episode)
+    app.router.add_delete("/sonarr/api/v3/episodefile/bulk", delete_files("episodefile"))
+    app.router.add_delete("/sonarr/api/v3/episodefile/{id}", delete_files("episodefile"))
+    return app
+
+async def start_stub(host="127.0.0.1", port=0, movies=2000, series=500, latency=0.0, jitter=0.0):
+    app = build_app(StubLibrary(movies, series), latency, jitter)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, app, f"http://{host}:{bound_port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a stub Radarr/Sonarr for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--series", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--webhook", metavar="URL", help="instead of serving, POST one event to the bot, "
+                                                         "e.g. http://127.0.0.1:8787/webhook/radarr")
+    parser.add_argument("--event", choices=WEBHOOK_EVENTS, default="Grab")
+    parser.add_argument("--app", choices=("radarr", "sonarr"), default="radarr")
+    parser.add_argument("--ids", type=int, nargs="+", default=[1], help="movie or episode ids in the stub library")
+    parser.add_argument("--token")
+    args = parser.parse_args()
+    if args.webhook:
+        payload = webhook_payload(StubLibrary(args.movies, args.series), args.app, args.event, args.ids)
+        print(asyncio.run(send_webhook(args.webhook, payload, args.token)))
+        return
+    app = build_app(StubLibrary(args.movies, args.series), args.latency_ms / 1000, args.jitter_ms / 1000)
+    print(f"Radarr: http://{args.host}:{args.port}/radarr/api/v3", file=sys.stderr)
+    print(f"Sonarr: http://{args.host}:{args.port}/sonarr/api/v3", file=sys.stderr)
+    web.run_app(app, host=args.host, port=args.port, access_log=None)
+
+if __name__ == "__main__":
+    main()
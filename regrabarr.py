@@ -1,25 +1,165 @@
+import os
 import sys
+import csv
 import time
+import json
+import codecs
+import asyncio
+import contextvars
+import re
+import random
+import bisect
+import heapq
+import difflib
+import hashlib
+import atexit
+import copy
 import logging
-import requests
+import logging.handlers
+import sqlite3
+import argparse
+from collections import OrderedDict
+from queue import SimpleQueue
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+from aiohttp import web
 import yaml
 import discord
+import prometheus_client
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.ui import Select, View, Button
-from datetime import datetime
+from datetime import datetime, timezone
 
 # ------------- Logging -------------
+# Until load_config() runs, plain synchronous logging. setup_logging() then routes every record
+# through a queue: the event loop only enqueues, and a listener thread formats and writes.
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+TEXT_LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+LOG_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "trace_id", "flow"}
+trace_sample_rate = 1.0
+log_listener = None
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only resolve the message and traceback here; formatting and I/O happen on the listener thread
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class TraceFilter(logging.Filter):
+    # Runs in the caller, where the flow's context variable is visible
+    def filter(self, record):
+        trace = current_trace.get()
+        record.trace_id = trace.id if trace else None
+        record.flow = trace.flow if trace else None
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+                 "level": record.levelname, "logger": record.name, "msg": record.getMessage()}
+        if record.trace_id:
+            entry["trace"], entry["flow"] = record.trace_id, record.flow
+        entry.update((k, v) for k, v in vars(record).items() if k not in LOG_RECORD_FIELDS)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        return f"{line} [trace={record.trace_id}]" if getattr(record, "trace_id", None) else line
+
+def setup_logging(options):
+    global log_listener
+    stop_logging()
+    records = SimpleQueue()
+    queue_handler = LogQueueHandler(records)
+    queue_handler.addFilter(TraceFilter())
+    logging.getLogger().handlers[:] = [queue_handler]
+    log_listener = logging.handlers.QueueListener(records, logging.StreamHandler(sys.stdout))
+    configure_logging(options)
+    log_listener.start()
+
+def configure_logging(options):
+    # Level, format and trace sampling; a config reload changes them in place, without stopping the listener
+    global trace_sample_rate
+    rate = options.get("trace_sample_rate")
+    trace_sample_rate = 1.0 if rate is None else float(rate)  # every flow by default; lower it to thin out spans
+    formatter = TextFormatter(TEXT_LOG_FORMAT) if options.get("log_format") == "text" else JsonFormatter()
+    for handler in log_listener.handlers:
+        handler.setFormatter(formatter)
+    logging.getLogger().setLevel(str(options.get("log_level", "INFO")).upper())
+
+def stop_logging():
+    # Drains whatever is still queued
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+atexit.register(stop_logging)
+
+# ------------- Tracing -------------
+# Every slash-command flow gets a trace id that follows it through the selectors, the confirm
+# button and the regrab worker, and is attached to each log line. Sampled flows (all of them unless
+# trace_sample_rate is lowered) also log a timed span per upstream call and per step.
+class Trace:
+    __slots__ = ("id", "flow", "sampled")
+
+    def __init__(self, flow, sampled):
+        self.id = os.urandom(6).hex()
+        self.flow = flow
+        self.sampled = sampled
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def sample():
+    return trace_sample_rate > 0 and random.random() < trace_sample_rate
+
+def start_trace(flow, media_info=None, user=None):
+    trace = Trace(flow, sample())
+    current_trace.set(trace)
+    if media_info is not None:
+        media_info["trace"] = trace
+    if trace.sampled:
+        logging.info(f"Tracing {flow} flow", extra={"user": user})
+    return trace
+
+def resume_trace(media_info):
+    trace = media_info.get("trace")
+    if trace is not None:
+        current_trace.set(trace)
+
+def tracing():
+    # Work outside any flow (index refreshes, polling) is sampled call by call
+    trace = current_trace.get()
+    return trace.sampled if trace is not None else sample()
+
+def log_span(span, seconds, **fields):
+    logging.info(f"{span} took {seconds * 1000:.1f} ms", extra=dict(fields, span=span, ms=round(seconds * 1000, 1)))
+
+
 # ------------- Config I/O -------------
 def get_config(file):
     with open(file, "r") as yaml_file:
         return yaml.safe_load(yaml_file)
 
 def save_config(file, config):
-    with open(file, "w") as yaml_file:
+    # Write a temp file and rename it over the original, so a crash never leaves half a config behind
+    tmp = f"{file}.tmp"
+    with open(tmp, "w") as yaml_file:
         yaml.safe_dump(config, yaml_file, sort_keys=False)  # keep human layout
+        yaml_file.flush()
+        os.fsync(yaml_file.fileno())  # on disk before it takes the original's place
+    os.replace(tmp, file)
 
 def ensure_section(cfg, name):
     if name not in cfg or cfg[name] is None:
@@ -29,100 +169,494 @@ def normalize_base_url(u: str) -> str:
     return (u or "").rstrip("/")
 
 # ------------- Constants -------------
+DEFAULT_CONFIG_LOCATION = "/config/config.yml"
 REQUEST_TIMEOUT = 15
-
-# ------------- Load config (startup behavior unchanged) -------------
-config_location = "/config/config.yml"
-config = get_config(config_location)
-
-ensure_section(config, "bot")
-ensure_section(config, "radarr")
-ensure_section(config, "sonarr")
-
-bot_token = config["bot"]["token"]
-
-radarr_api_key = config["radarr"]["api_key"]
-radarr_base_url = normalize_base_url(config["radarr"]["url"])
-sonarr_api_key = config["sonarr"]["api_key"]
-sonarr_base_url = normalize_base_url(config["sonarr"]["url"])
-
-regrab_movie_command_name = config["bot"].get("regrab_movie", "regrab_movie")
-regrab_episode_command_name = config["bot"].get("regrab_episode", "regrab_episode")
-
-# ------------- HTTP session -------------
-session = requests.Session()
-
-def perform_request(method, url, data=None, headers=None, params=None):
-    try:
-        if method == "GET":
-            response = session.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
-        elif method == "POST":
-            response = session.post(url, json=data, headers=headers, timeout=REQUEST_TIMEOUT)
-        elif method == "DELETE":
-            response = session.delete(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        else:
-            raise ValueError(f"Unsupported HTTP method: {method}")
-        response.raise_for_status()
-        return response
-    except Exception as e:
-        logging.error(f"{method} request failed: {e}")
-        return None
-
-# ------------- Discovery (unchanged startup methodology) -------------
-def get_root_folders(base_url, api_key):
-    url = f"{base_url}/rootfolder?apikey={api_key}"
-    try:
-        resp = session.get(url, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as e:
-        logging.error(f"Failed to get root folders from {base_url}: {e}")
-        return []
-
-def select_root_folder(folders):
-    if folders:
-        return folders[0]["path"]
-    raise Exception("No root folders available")
-
-def get_first_quality_profile(base_url, api_key):
-    url = f"{base_url}/qualityprofile?apikey={api_key}"
-    try:
-        resp = session.get(url, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        profiles = resp.json()
-        if profiles:
-            return profiles[0]["id"]
-        else:
-            raise Exception("No quality profiles available")
-    except Exception as e:
-        logging.error(f"Failed to get quality profiles from {base_url}: {e}")
-        return None
-
-def ensure_config_value(section, key, fetch_func):
-    if key not in config[section] or not config[section][key]:
-        value = fetch_func()
-        if value:
-            config[section][key] = value
-            save_config(config_location, config)
-            logging.info(f"Set {key} for {section}: {value}")
-        else:
-            logging.critical(f"Could not fetch {key} for {section}. Exiting.")
-            sys.exit(1)
-    return config[section][key]
-
-# Fill when missing
-sonarr_quality_profile_id = ensure_config_value("sonarr", "qualityprofileid",
-    lambda: get_first_quality_profile(sonarr_base_url, sonarr_api_key))
-sonarr_root_folder_path = ensure_config_value("sonarr", "root_path",
-    lambda: select_root_folder(get_root_folders(sonarr_base_url, sonarr_api_key)))
-
-radarr_quality_profile_id = ensure_config_value("radarr", "qualityprofileid",
-    lambda: get_first_quality_profile(radarr_base_url, radarr_api_key))
-radarr_root_folder_path = ensure_config_value("radarr", "root_path",
-    lambda: select_root_folder(get_root_folders(radarr_base_url, radarr_api_key)))
+HTTP_POOL_SIZE = 10           # open connections per *arr instance
+HTTP_KEEPALIVE_TIMEOUT = 30   # seconds an idle connection is kept for reuse
+DEFAULT_RETRIES = 2           # extra attempts for transient failures
+RETRY_BASE_DELAY = 0.5        # seconds; doubled per attempt, with full jitter
+RETRY_MAX_DELAY = 5
+RETRY_STATUSES = (429, 502, 503, 504)
+BREAKER_THRESHOLD = 5         # transient failures in a row before an instance is considered down
+BREAKER_RESET = 30            # seconds before a probe request is let through again
+DEFAULT_INDEX_REFRESH_MINUTES = 15
+DEFAULT_LOOKUP_CACHE_TTL = 300  # seconds
+DEFAULT_LOOKUP_CACHE_SIZE = 256
+DEFAULT_EPISODE_CACHE_TTL = 120  # seconds; our own regrabs invalidate sooner
+DEFAULT_EPISODE_CACHE_SIZE = 128  # (series, season) lists per instance
+DEFAULT_REGRAB_CONCURRENCY = 2     # regrab jobs running at once per instance
+DEFAULT_REQUESTS_PER_SECOND = 5    # upstream requests/s issued by regrab jobs per instance
+DEFAULT_REGRAB_COOLDOWN = 600      # seconds before the same item can be regrabbed again
+POLL_MIN_INTERVAL = 3               # seconds; command poller backs off from here...
+POLL_MAX_INTERVAL = 60              # ...to here while nothing changes
+POLL_BACKOFF = 1.5
+WATCH_TIMEOUT = 6 * 60 * 60         # stop following a regrab after this many seconds
+READD_SEARCH_WINDOW = 10 * 60       # re-added movies have no command to wait on; give the search this long
+QUEUE_GRACE = 2 * 60                # a grab only reaches /queue after the *arr's tracked-download refresh
+REGRAB_MODES = ("search", "readd")  # search: delete file + MoviesSearch, readd: delete movie + re-add
+MAX_SELECT_OPTIONS = 25  # Discord's cap on select menu options
+DISCOVERY_TIMEOUT = 10              # seconds per discovery attempt against one instance
+DISCOVERY_ATTEMPTS = 5
+DISCOVERY_RETRY_DELAY = 2           # doubled after each failed attempt
+SNAPSHOT_FILE = "regrabarr.db"      # next to config.yml
+SNAPSHOT_SCHEMA_VERSION = 2         # bump when the tables or record rows change; an old snapshot is then dropped
+STREAM_CHUNK_SIZE = 64 * 1024       # bytes read at a time when streaming a JSON array
+CONFIG_WATCH_SECONDS = 5            # how often config.yml is checked for changes
+SESSION_DRAIN_SECONDS = REQUEST_TIMEOUT + 5  # a replaced connection pool is closed after this long
+# Only read at startup; changing them in config.yml takes a restart
+RESTART_BOT_KEYS = ("token", "intents", "max_messages", "sharded", "shard_count", "snapshot", "config_watch_seconds")
+
+# ------------- Settings -------------
+# Filled in by load_config() when the bot starts, so importing this module does no I/O.
+config_location = DEFAULT_CONFIG_LOCATION
+config = {}
+bot_token = None
+regrab_movie_command_name = "regrab_movie"
+regrab_episode_command_name = "regrab_episode"
+regrab_sweep_command_name = "regrab_sweep"
+lookup_cache_ttl = DEFAULT_LOOKUP_CACHE_TTL
+lookup_cache_size = DEFAULT_LOOKUP_CACHE_SIZE
+episode_cache_ttl = DEFAULT_EPISODE_CACHE_TTL
+episode_cache_size = DEFAULT_EPISODE_CACHE_SIZE
+# Optional: Radarr/Sonarr "Webhook" connections pointed at http://<bot>:<port>/webhook/<instance name>
+webhook_config = {}
+# Optional: Prometheus scrape endpoint at http://<bot>:<port>/metrics
+metrics_config = {}
+library_snapshot = None
+
+def instance_configs(section, source=None):
+    # `radarr:` may be a single mapping (one instance) or a list of them (e.g. 1080p + 4K)
+    value = (config if source is None else source).get(section)
+    return value if isinstance(value, list) else [value]
+
+# ------------- Metrics -------------
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30, 60, 180)
+LOOP_LAG_INTERVAL = 1.0
+
+ARR_REQUEST_SECONDS = Histogram("regrabarr_upstream_request_seconds", "Latency of Radarr/Sonarr API calls",
+                                ["app", "endpoint", "method"], buckets=LATENCY_BUCKETS)
+ARR_REQUEST_ERRORS = Counter("regrabarr_upstream_request_errors_total", "Failed Radarr/Sonarr API calls",
+                             ["app", "endpoint", "method", "reason"])
+INTERACTION_STAGE_SECONDS = Histogram("regrabarr_interaction_stage_seconds", "Time spent in each step of a regrab flow",
+                                      ["flow", "stage"], buckets=STAGE_BUCKETS)
+EVENT_LOOP_LAG = Histogram("regrabarr_event_loop_lag_seconds", "How late the event loop wakes a 1s sleeper",
+                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+EVENT_LOOP_LAG_LAST = Gauge("regrabarr_event_loop_lag_last_seconds", "Most recent event loop lag sample")
+ARR_CIRCUIT_STATE = Gauge("regrabarr_upstream_circuit_state", "Circuit breaker per instance: 0 closed, 1 half-open, 2 open",
+                          ["app"])
+
+def endpoint_label(instance, url):
+    # http://host:7878/api/v3/movie/lookup?term=x -> "movie/lookup"
+    path = url[len(instance.base_url):] if url.startswith(instance.base_url) else url
+    parts = [p for p in path.split("?")[0].split("/") if p]
+    if not parts:
+        return "root"
+    if len(parts) > 1 and not parts[1].isdigit():
+        return f"{parts[0]}/{parts[1]}"  # lookup, bulk, details
+    return parts[0]
+
+def mark_stage(media_info, flow, stage):
+    # Observe time since the previous step of this flow and start timing the next one
+    now = time.monotonic()
+    last = media_info.get("_stage_at")
+    if last is not None:
+        INTERACTION_STAGE_SECONDS.labels(flow, stage).observe(now - last)
+        trace = media_info.get("trace")
+        if trace is not None and trace.sampled:
+            log_span(f"{flow} {stage}", now - last)
+    media_info["_stage_at"] = now
+
+class CacheCollector:
+    # Reads LookupCache counters at scrape time instead of mirroring every hit
+    def collect(self):
+        caches = [cache for inst in arr_instances.values() for cache in (inst.lookup_cache, inst.episode_cache)]
+        families = {
+            "hits": CounterMetricFamily("regrabarr_cache_hits", "Lookup cache hits", labels=["cache"]),
+            "misses": CounterMetricFamily("regrabarr_cache_misses", "Lookup cache misses", labels=["cache"]),
+            "coalesced": CounterMetricFamily("regrabarr_cache_coalesced", "Lookups that joined an in-flight request", labels=["cache"]),
+            "evictions": CounterMetricFamily("regrabarr_cache_evictions", "Entries evicted for size", labels=["cache"]),
+        }
+        size = GaugeMetricFamily("regrabarr_cache_entries", "Entries currently cached", labels=["cache"])
+        for cache in caches:
+            stats = cache.stats()
+            for name, family in families.items():
+                family.add_metric([cache.name], stats[name])
+            size.add_metric([cache.name], stats["size"])
+        yield from families.values()
+        yield size
+
+async def measure_loop_lag():
+    while True:
+        start = time.monotonic()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.monotonic() - start - LOOP_LAG_INTERVAL)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+async def handle_metrics(request):
+    body = prometheus_client.generate_latest()
+    return web.Response(body=body, headers={"Content-Type": prometheus_client.CONTENT_TYPE_LATEST})
+
+# ------------- Async HTTP client -------------
+# Body is read before the connection goes back to the pool, so callers can keep
+# using .status_code / .json() like they did with requests.
+class ArrResponse:
+    __slots__ = ("status_code", "body", "records")
+
+    def __init__(self, status_code, body, records=None):
+        self.status_code = status_code
+        self.body = body
+        self.records = records  # set instead of body when the request asked for projected records
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+def new_http_session(pool_size=HTTP_POOL_SIZE, keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT):
+    # Created lazily by each instance so it binds to the bot's running loop.
+    connector = aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size, keepalive_timeout=keepalive_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+
+async def close_http_sessions():
+    for inst in arr_instances.values():
+        await inst.close()
+
+BREAKER_STATES = ("closed", "half_open", "open")
+
+class CircuitBreaker:
+    # Opens after `threshold` transient failures in a row and then fails fast; after `reset_after`
+    # seconds one probe request goes through (half-open) and its outcome closes or re-opens it.
+    def __init__(self, name, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET, on_change=None):
+        self.name = name
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.on_change = on_change
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = None
+
+    def is_open(self):
+        return self.state == "open" and time.monotonic() - self.opened_at < self.reset_after
+
+    def allow(self):
+        if self.state == "closed":
+            return True
+        if self.is_open():
+            return False
+        now = time.monotonic()
+        if self.probe_at is not None and now - self.probe_at < self.reset_after:
+            return False  # one probe at a time
+        self.probe_at = now
+        self._set("half_open")
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.probe_at = None
+        self._set("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_at = None
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self._set("open")
+
+    def _set(self, state):
+        if state == self.state:
+            return
+        log = logging.info if state == "closed" else logging.warning
+        log(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        if self.on_change:
+            self.on_change(self)
+
+def is_transient(error):
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES or error.status >= 500
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+def may_retry(method, error):
+    # GET/PUT/DELETE are idempotent; a POST is only repeated when it never reached the server
+    if method == "POST":
+        return isinstance(error, aiohttp.ClientConnectorError)
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRY_STATUSES
+    return is_transient(error)
+
+def backoff_delay(attempt):
+    # Full jitter, so callers that failed together don't retry together
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+# Set by regrab workers so their upstream calls honour the instance's rate cap
+request_limiter = contextvars.ContextVar("request_limiter", default=None)
+
+async def perform_request(instance, method, url, data=None, headers=None, params=None, project=None):
+    # project: turn each element of a JSON array response into a record while it streams in
+    if method not in ("GET", "POST", "PUT", "DELETE"):
+        raise ValueError(f"Unsupported HTTP method: {method}")
+    app, endpoint = instance.name, endpoint_label(instance, url)
+    breaker = instance.breaker
+    limiter = request_limiter.get()
+    traced = tracing()
+    attempts = 1 + instance.retries
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow():
+            ARR_REQUEST_ERRORS.labels(app, endpoint, method, "circuit_open").inc()
+            logging.debug(f"{method} request to {app} skipped: circuit open")
+            return None
+        if limiter is not None:
+            await limiter.acquire()
+        start = time.monotonic()
+        outcome = None
+        try:
+            async with instance.http_session().request(method, url, json=data, headers=headers, params=params) as response:
+                outcome = response.status
+                if project is not None and response.status < 400:
+                    records = [project(item) async for item in stream_json_array(response.content)]
+                    breaker.record_success()
+                    return ArrResponse(response.status, None, records)
+                body = await response.read()
+                if method == "DELETE" and response.status == 404 and attempt > 1:
+                    breaker.record_success()
+                    return ArrResponse(200, body)  # an earlier attempt got through before the error
+                response.raise_for_status()
+                breaker.record_success()
+                return ArrResponse(response.status, body)
+        except Exception as e:
+            reason = outcome = str(e.status) if isinstance(e, aiohttp.ClientResponseError) else type(e).__name__
+            ARR_REQUEST_ERRORS.labels(app, endpoint, method, reason).inc()
+            if is_transient(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()  # the instance answered; the request itself was wrong
+            if attempt < attempts and may_retry(method, e):
+                delay = backoff_delay(attempt)
+                logging.warning(f"{method} request to {app} failed ({reason}); retry {attempt}/{attempts - 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            logging.error(f"{method} request failed: {e}")
+            return None
+        finally:
+            elapsed = time.monotonic() - start
+            ARR_REQUEST_SECONDS.labels(app, endpoint, method).observe(elapsed)
+            if traced:
+                log_span(f"{method} {endpoint}", elapsed, app=app, attempt=attempt, outcome=outcome)
+
+# ------------- Records -------------
+# *arr payloads carry images, ratings, alternate titles, media info... The bot reads a
+# handful of fields, so array responses are decoded one element at a time as they arrive and
+# each element is projected straight into a small __slots__ record. The full document never exists.
+_json_decoder = json.JSONDecoder()
+
+async def stream_json_array(stream, chunk_size=STREAM_CHUNK_SIZE):
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    buf, pos, started, eof = "", 0, False, False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = _json_decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # Objects, arrays and strings end on their own delimiter, but a number also decodes from a
+                # prefix ("2" of "2.5"), so it only counts once the character after it closes it
+                if buf[pos] in '{["' or (end < len(buf) and buf[end] in " \t\r\n,]") or (end == len(buf) and eof):
+                    yield item
+                    pos = end
+                    continue
+                if eof:
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buf, end)
+        elif eof:
+            raise ValueError("truncated JSON array")
+        chunk = await stream.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + decode(chunk, final=eof)
+        pos = 0
+
+def compact_images(images):
+    return [{"coverType": i.get("coverType"), "remoteUrl": i.get("remoteUrl")} for i in images or []]
+
+class Record:
+    __slots__ = ()
+    snapshot_fields = ()  # what the on-disk snapshot keeps, in row order
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self.__slots__)})"
+
+    def row(self):
+        return [getattr(self, f) for f in self.snapshot_fields]
+
+    @classmethod
+    def from_row(cls, instance, row):
+        return cls(instance=instance, **dict(zip(cls.snapshot_fields, row)))
+
+class MovieRecord(Record):
+    __slots__ = ("instance", "id", "tmdb_id", "title", "year", "title_slug", "overview", "images", "monitored",
+                 "movie_file_id")
+    snapshot_fields = ("id", "tmdb_id", "title", "year", "title_slug", "monitored", "movie_file_id")
+
+    @classmethod
+    def from_json(cls, instance, data):
+        return cls(instance=instance, id=data.get("id"), tmdb_id=data.get("tmdbId"),
+                   title=data.get("title") or "Unknown Title", year=data.get("year"),
+                   title_slug=data.get("titleSlug") or "", overview=data.get("overview"),
+                   images=compact_images(data.get("images")), monitored=bool(data.get("monitored")),
+                   movie_file_id=(data.get("movieFile") or {}).get("id"))
+
+class SeriesRecord(Record):
+    __slots__ = ("instance", "id", "tvdb_id", "title", "year", "title_slug", "overview", "images", "monitored",
+                 "seasons")
+    snapshot_fields = ("id", "tvdb_id", "title", "year", "title_slug", "monitored", "seasons")
+
+    @classmethod
+    def from_json(cls, instance, data):
+        return cls(instance=instance, id=data.get("id"), tvdb_id=data.get("tvdbId"),
+                   title=data.get("title") or "Unknown Title", year=data.get("year"),
+                   title_slug=data.get("titleSlug") or "", overview=data.get("overview"),
+                   images=compact_images(data.get("images")), monitored=bool(data.get("monitored")),
+                   seasons=sorted(s["seasonNumber"] for s in data.get("seasons") or [] if s.get("seasonNumber") is not None))
+
+class EpisodeRecord(Record):
+    __slots__ = ("id", "series_id", "season_number", "episode_number", "title", "overview", "air_date",
+                 "episode_file_id")
+    snapshot_fields = __slots__
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(id=data.get("id"), series_id=data.get("seriesId"), season_number=data.get("seasonNumber"),
+                   episode_number=data.get("episodeNumber"), title=data.get("title") or "",
+                   overview=data.get("overview"), air_date=data.get("airDate"),
+                   episode_file_id=data.get("episodeFileId") or None)
+
+# ------------- Discovery -------------
+# Fills qualityprofileid/root_path when they are missing from the config. Runs in the background
+# after login; everything except adding a new movie/series works while it is still going.
+async def get_first_quality_profile(inst):
+    resp = await perform_request(inst, "GET", f"{inst.base_url}/qualityprofile", headers={"X-Api-Key": inst.api_key})
+    if resp is None:
+        raise Exception("no response")
+    profiles = resp.json() if resp else None
+    if not profiles:
+        raise Exception("No quality profiles available")
+    return profiles[0]["id"]
+
+async def get_root_folder(inst):
+    resp = await perform_request(inst, "GET", f"{inst.base_url}/rootfolder", headers={"X-Api-Key": inst.api_key})
+    if resp is None:
+        raise Exception("no response")
+    folders = resp.json() if resp else None
+    if not folders:
+        raise Exception("No root folders available")
+    return folders[0]["path"]
+
+async def discover_instances():
+    pending = [inst for inst in arr_instances.values() if inst.needs_discovery()]
+    if not pending:
+        return
+    start = time.monotonic()
+    found = await asyncio.gather(*(inst.discovery_task() for inst in pending))
+    if any(found):
+        save_config(config_location, config)  # one write for everything discovered
+    logging.info(f"Discovery finished in {time.monotonic() - start:.1f}s "
+                 f"({sum(found)}/{len(pending)} instance(s) ready)")
 
 # ------------- Discord bot -------------
-bot = commands.Bot(command_prefix="!", intents=discord.Intents.all())
+class RegrabBot(commands.Bot):
+    commands_synced = False
+
+    async def setup_hook(self):
+        for inst in arr_instances.values():
+            inst.start()
+        command_poller.start()
+        if config_watcher.interval:
+            config_watcher.start()
+        await http_server.start(http_listeners())
+        self.loop_lag_task = asyncio.create_task(measure_loop_lag())
+        self.discovery_task = asyncio.create_task(discover_instances())  # don't hold up the gateway connection
+
+    async def close(self):
+        for inst in arr_instances.values():
+            await inst.stop()
+        await command_poller.stop()
+        config_watcher.stop()
+        await http_server.stop()
+        for task in (getattr(self, "loop_lag_task", None), getattr(self, "discovery_task", None)):
+            if task:
+                task.cancel()
+        await super().close()
+        await close_http_sessions()
+        if library_snapshot:
+            library_snapshot.close()
+
+    async def on_ready(self):
+        logging.info("Bot is Up and Ready!")
+        await update_presence()
+        if not self.commands_synced:  # on_ready fires again after every reconnect; the tree hasn't changed
+            await self.sync_commands()
+
+    async def sync_commands(self):
+        # Discord rate-limits syncs, so a restart only syncs when the commands differ from the last ones synced
+        payload = json.dumps([command.to_dict() for command in self.tree.get_commands()], sort_keys=True)
+        if library_snapshot and await library_snapshot.state("synced_commands") == payload:
+            self.commands_synced = True
+            logging.info("Commands unchanged since the last sync")
+            return
+        try:
+            synced = await self.tree.sync()
+            self.commands_synced = True
+            if library_snapshot:
+                library_snapshot.save_state("synced_commands", payload)
+            logging.info(f"Synced {len(synced)} command(s)")
+        except Exception as e:
+            logging.error(f"{e}")
+
+class ShardedRegrabBot(RegrabBot, commands.AutoShardedBot):
+    pass
+
+def build_bot(options):
+    # Slash commands and buttons arrive as interactions, which need no intents at all; the guilds
+    # intent only keeps channels resolvable. "all" restores the old behaviour of caching everything.
+    mode = options.get("intents", "minimal")
+    kwargs = {}
+    if mode == "minimal":
+        intents = discord.Intents.none()
+        intents.guilds = True
+        kwargs.update(member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+        max_messages = options.get("max_messages", 0)
+    elif mode == "all":
+        intents = discord.Intents.all()
+        max_messages = options.get("max_messages", 1000)
+    else:
+        logging.critical(f"Unknown bot.intents '{mode}' (expected 'minimal' or 'all'). Exiting.")
+        sys.exit(1)
+    if options.get("sharded"):
+        cls = ShardedRegrabBot
+        if options.get("shard_count"):
+            kwargs["shard_count"] = options["shard_count"]
+    else:
+        cls = RegrabBot
+    return cls(command_prefix="!", intents=intents, max_messages=max_messages or None, **kwargs)
+
+bot = None  # built by load_config() once the intents and sharding options are known
 
 async def safe_delete_original(interaction: discord.Interaction):
     try:
@@ -130,124 +664,1389 @@ async def safe_delete_original(interaction: discord.Interaction):
     except Exception:
         pass
 
-@bot.event
-async def on_ready():
-    logging.info("Bot is Up and Ready!")
+async def acknowledge(interaction: discord.Interaction):
+    # Discord drops a component interaction that isn't answered within 3s. Callbacks that wait on
+    # Radarr/Sonarr answer first and then edit the message with edit_deferred().
     try:
-        synced = await bot.tree.sync()
-        logging.info(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        logging.error(f"{e}")
-
-# ------------- Radarr helpers -------------
-def radarr_lookup(term: str):
-    url = f"{radarr_base_url}/movie/lookup?term={term}"
-    headers = {"X-Api-Key": radarr_api_key}
-    return perform_request("GET", url, headers=headers)
+        await interaction.response.defer()
+        return True
+    except discord.errors.NotFound:
+        return False
 
-def radarr_find_by_tmdb(tmdb_id: int):
+async def edit_deferred(interaction: discord.Interaction, content, view=None):
     try:
-        resp = session.get(
-            f"{radarr_base_url}/movie",
-            params={"tmdbId": tmdb_id},
-            headers={"X-Api-Key": radarr_api_key},
-            timeout=REQUEST_TIMEOUT,
-        )
-        if resp.ok:
-            data = resp.json()
-            if isinstance(data, list) and data:
-                return data[0]
-    except Exception as e:
-        logging.error(f"radarr_find_by_tmdb failed: {e}")
+        await interaction.edit_original_response(content=content, view=view)
+    except discord.errors.NotFound:
+        pass  # message dismissed meanwhile
+
+# ------------- Radarr helpers -------------
+def movie_records(inst):
+    return lambda data: MovieRecord.from_json(inst.name, data)
+
+async def radarr_lookup(inst, term: str):
+    url = f"{inst.base_url}/movie/lookup"
+    headers = {"X-Api-Key": inst.api_key}
+    return await perform_request(inst, "GET", url, headers=headers, params={"term": term}, project=movie_records(inst))
+
+async def radarr_find_by_tmdb(inst, tmdb_id: int):
+    resp = await perform_request(inst, "GET", f"{inst.base_url}/movie",
+                                 headers={"X-Api-Key": inst.api_key}, params={"tmdbId": tmdb_id},
+                                 project=movie_records(inst))
+    if resp and resp.records:
+        return resp.records[0]
     return None
 
-def radarr_add_and_search(tmdb_id: int, title: str, year, title_slug: str, images):
+async def radarr_add_and_search(inst, tmdb_id: int, title: str, year, title_slug: str, images):
     payload = {
         "tmdbId": tmdb_id,
         "title": title,
         "year": year,
-        "qualityProfileId": radarr_quality_profile_id,
+        "qualityProfileId": inst.quality_profile_id,
         "titleSlug": title_slug or "",
         "images": images or [],
         "monitored": True,
-        "rootFolderPath": radarr_root_folder_path,
+        "rootFolderPath": inst.root_folder_path,
         "addOptions": {"searchForMovie": True},
     }
-    return perform_request("POST", f"{radarr_base_url}/movie?apikey={radarr_api_key}",
-                           data=payload, headers={"Content-Type": "application/json"})
+    return await perform_request(inst, "POST", f"{inst.base_url}/movie",
+                                 data=payload, headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
+
+async def radarr_delete_movie(inst, movie_id: int, delete_files=True):
+    return await perform_request(inst, "DELETE", f"{inst.base_url}/movie/{movie_id}",
+                                 headers={"X-Api-Key": inst.api_key},
+                                 params={"deleteFiles": "true" if delete_files else "false"})
+
+async def radarr_delete_moviefiles(inst, movie_file_ids):
+    ids = [i for i in movie_file_ids if i]
+    if len(ids) == 1:
+        return await perform_request(inst, "DELETE", f"{inst.base_url}/moviefile/{ids[0]}",
+                                     headers={"X-Api-Key": inst.api_key})
+    return await perform_request(inst, "DELETE", f"{inst.base_url}/moviefile/bulk",
+                                 data={"movieFileIds": ids},
+                                 headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
+
+async def radarr_commands(inst):
+    return await perform_request(inst, "GET", f"{inst.base_url}/command", headers={"X-Api-Key": inst.api_key})
+
+async def radarr_queue_details(inst):
+    return await perform_request(inst, "GET", f"{inst.base_url}/queue/details", headers={"X-Api-Key": inst.api_key})
+
+async def radarr_movies_all(inst):
+    # None (not []) on failure so the index never mistakes an outage for an empty library
+    resp = await perform_request(inst, "GET", f"{inst.base_url}/movie", headers={"X-Api-Key": inst.api_key},
+                                 project=movie_records(inst))
+    if resp:
+        return resp.records
+    return None
 
-def radarr_delete_movie(movie_id: int, delete_files=True):
-    return perform_request("DELETE",
-        f"{radarr_base_url}/movie/{movie_id}?deleteFiles={'true' if delete_files else 'false'}&apikey={radarr_api_key}"
-    )
+async def radarr_monitor_movies(inst, movie_ids):
+    return await perform_request(inst, "PUT", f"{inst.base_url}/movie/editor",
+                                 data={"movieIds": list(movie_ids), "monitored": True},
+                                 headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
 
-def radarr_movies_search(movie_id: int):
-    payload = {"name": "MoviesSearch", "movieIds": [movie_id]}
-    return perform_request("POST", f"{radarr_base_url}/command/",
-                           data=payload, headers={"Content-Type": "application/json", "X-Api-Key": radarr_api_key})
+async def radarr_movies_search(inst, movie_ids):
+    payload = {"name": "MoviesSearch", "movieIds": list(movie_ids)}
+    return await perform_request(inst, "POST", f"{inst.base_url}/command/",
+                                 data=payload, headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
 
 # ------------- Sonarr helpers -------------
-def sonarr_series_lookup(term: str):
-    url = f"{sonarr_base_url}/series/lookup?term={term}"
-    headers = {"X-Api-Key": sonarr_api_key}
-    return perform_request("GET", url, headers=headers)
-
-def sonarr_series_all():
-    try:
-        resp = session.get(f"{sonarr_base_url}/series?apikey={sonarr_api_key}", timeout=REQUEST_TIMEOUT)
-        if resp.ok:
-            return resp.json()
-    except Exception as e:
-        logging.error(f"sonarr_series_all failed: {e}")
-    return []
+def series_records(inst):
+    return lambda data: SeriesRecord.from_json(inst.name, data)
+
+async def sonarr_series_lookup(inst, term: str):
+    url = f"{inst.base_url}/series/lookup"
+    headers = {"X-Api-Key": inst.api_key}
+    return await perform_request(inst, "GET", url, headers=headers, params={"term": term}, project=series_records(inst))
+
+async def sonarr_series_all(inst):
+    # None (not []) on failure so the index never mistakes an outage for an empty library
+    resp = await perform_request(inst, "GET", f"{inst.base_url}/series", headers={"X-Api-Key": inst.api_key},
+                                 project=series_records(inst))
+    if resp:
+        return resp.records
+    return None
 
-def sonarr_find_series_by_tvdb(tvdb_id: int):
-    for s in sonarr_series_all():
-        if s.get("tvdbId") == tvdb_id:
-            return s
+async def sonarr_series_by_tvdb(inst, tvdb_id: int):
+    resp = await perform_request(inst, "GET", f"{inst.base_url}/series",
+                                 headers={"X-Api-Key": inst.api_key}, params={"tvdbId": tvdb_id},
+                                 project=series_records(inst))
+    if resp and resp.records:
+        return resp.records[0]
     return None
 
-def sonarr_add_series(title: str, tvdb_id: int, title_slug: str, images):
+async def sonarr_find_series_by_tvdb(inst, tvdb_id: int):
+    series = inst.index.get_by_external(tvdb_id)
+    if series:
+        return series
+    # Added outside the bot since the last refresh: ask for just this one
+    series = await sonarr_series_by_tvdb(inst, tvdb_id)
+    if series:
+        inst.index.upsert(series)
+    return series
+
+async def sonarr_add_series(inst, title: str, tvdb_id: int, title_slug: str, images):
     payload = {
         "title": title,
         "tvdbId": tvdb_id,
-        "qualityProfileId": sonarr_quality_profile_id,
+        "qualityProfileId": inst.quality_profile_id,
         "titleSlug": title_slug or "",
         "images": images or [],
         "monitored": True,
-        "rootFolderPath": sonarr_root_folder_path,
+        "rootFolderPath": inst.root_folder_path,
         "addOptions": {"searchForMissingEpisodes": True},
     }
-    return perform_request("POST", f"{sonarr_base_url}/series?apikey={sonarr_api_key}",
-                           data=payload, headers={"Content-Type": "application/json"})
+    return await perform_request(inst, "POST", f"{inst.base_url}/series",
+                                 data=payload, headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
+
+async def sonarr_fetch_episodes(inst, series_id: int, season_number=None):
+    url = f"{inst.base_url}/episode"
+    params = {"seriesId": series_id}
+    if season_number is not None:  # None: every season at once
+        params["seasonNumber"] = season_number
+    headers = {"X-Api-Key": inst.api_key}
+    return await perform_request(inst, "GET", url, headers=headers, params=params, project=EpisodeRecord.from_json)
+
+async def sonarr_get_episode(inst, episode_id: int):
+    resp = await perform_request(inst, "GET", f"{inst.base_url}/episode/{episode_id}", headers={"X-Api-Key": inst.api_key})
+    if resp and resp.status_code == 200:
+        return EpisodeRecord.from_json(resp.json())
+    return None
 
-def sonarr_fetch_episodes(series_id: int, season_number: int):
-    url = f"{sonarr_base_url}/episode"
-    params = {"seriesId": series_id, "seasonNumber": season_number}
-    headers = {"X-Api-Key": sonarr_api_key}
-    return perform_request("GET", url, headers=headers, params=params)
+async def sonarr_delete_episodefile(inst, episode_file_id: int):
+    return await perform_request(inst, "DELETE", f"{inst.base_url}/episodefile/{episode_file_id}",
+                                 headers={"X-Api-Key": inst.api_key})
 
-def sonarr_delete_episodefile(episode_file_id: int):
-    return perform_request("DELETE", f"{sonarr_base_url}/episodefile/{episode_file_id}?apikey={sonarr_api_key}")
+async def sonarr_delete_episodefiles(inst, episode_file_ids):
+    # One bulk call instead of one DELETE per file
+    ids = [i for i in episode_file_ids if i]
+    if len(ids) == 1:
+        return await sonarr_delete_episodefile(inst, ids[0])
+    return await perform_request(inst, "DELETE", f"{inst.base_url}/episodefile/bulk",
+                                 data={"episodeFileIds": ids},
+                                 headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
 
-def sonarr_episode_search(episode_id: int):
-    payload = {"name": "EpisodeSearch", "episodeIds": [episode_id]}
-    return perform_request("POST", f"{sonarr_base_url}/command/",
-                           data=payload, headers={"Content-Type": "application/json", "X-Api-Key": sonarr_api_key})
+async def sonarr_episode_search(inst, episode_ids):
+    payload = {"name": "EpisodeSearch", "episodeIds": list(episode_ids)}
+    return await perform_request(inst, "POST", f"{inst.base_url}/command/",
+                                 data=payload, headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
 
-def sonarr_series_search(series_id: int):
+async def sonarr_commands(inst):
+    return await perform_request(inst, "GET", f"{inst.base_url}/command", headers={"X-Api-Key": inst.api_key})
+
+async def sonarr_queue_details(inst):
+    return await perform_request(inst, "GET", f"{inst.base_url}/queue/details", headers={"X-Api-Key": inst.api_key})
+
+async def sonarr_series_search(inst, series_id: int):
     payload = {"name": "SeriesSearch", "seriesId": series_id}
-    return perform_request("POST", f"{sonarr_base_url}/command/",
-                           data=payload, headers={"Content-Type": "application/json", "X-Api-Key": sonarr_api_key})
+    return await perform_request(inst, "POST", f"{inst.base_url}/command/",
+                                 data=payload, headers={"Content-Type": "application/json", "X-Api-Key": inst.api_key})
+
+# ------------- Lookup cache -------------
+def normalize_term(term) -> str:
+    return " ".join((term or "").lower().split())
+
+class LookupCache:
+    # TTL + LRU cache; concurrent misses for the same key share one upstream call
+    def __init__(self, name, ttl, maxsize):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key=None):
+        if key is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(key, None)
+
+    async def get_or_fetch(self, key, fetch):
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self.inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, fetch))
+            self.inflight[key] = task
+        else:
+            self.coalesced += 1
+        # shield: one impatient caller must not cancel the fetch for everyone else
+        return await asyncio.shield(task)
+
+    def prefetch(self, key, fetch):
+        # Start loading in the background; get_or_fetch()/join() on the same key share the result
+        if self.get(key) is None and key not in self.inflight:
+            self.misses += 1
+            self.inflight[key] = asyncio.ensure_future(self._load(key, fetch))
+
+    async def join(self, key):
+        # Wait for an in-flight load of key, if there is one
+        task = self.inflight.get(key)
+        if task is not None:
+            await asyncio.shield(task)
+
+    async def _load(self, key, fetch):
+        try:
+            value = await fetch()
+            if value is not None:  # never cache failures
+                self.set(key, value)
+            return value
+        finally:
+            self.inflight.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+# ------------- Library indexes -------------
+AUTOCOMPLETE_LIMIT = 25  # Discord's cap on autocomplete choices
+FUZZY_CANDIDATES = 100   # titles sharing the most trigrams with the query; only these get the difflib pass
+
+NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+def normalize_title(title) -> str:
+    return " ".join(NON_ALNUM.sub(" ", (title or "").lower()).split())
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class LibraryIndex:
+    # Radarr/Sonarr library keyed by *arr id, external id (tmdb_id/tvdb_id) and normalized title
+    def __init__(self, name, external_key, fetch_all):
+        self.name = name
+        self.external_key = external_key
+        self.fetch_all = fetch_all
+        self.by_external = {}
+        self.by_id = {}
+        self.by_title = {}
+        self.by_trigram = {}
+        self.sorted_titles = []
+        self.ready = False
+        self.last_refresh = None
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def upsert(self, item):
+        item_id = item.id
+        if item_id is None:
+            return
+        old = self.by_id.get(item_id)
+        if old is not None:
+            self._unlink(old)
+        self.by_id[item_id] = item
+        external_id = getattr(item, self.external_key)
+        if external_id:
+            self.by_external[external_id] = item
+        key = normalize_title(item.title)
+        if key:
+            if key not in self.by_title:
+                bisect.insort(self.sorted_titles, key)
+                for gram in trigrams(key):
+                    self.by_trigram.setdefault(gram, set()).add(key)
+            self.by_title.setdefault(key, []).append(item)
+
+    def remove(self, item_id):
+        old = self.by_id.pop(item_id, None)
+        if old is not None:
+            self._unlink(old)
+
+    def _unlink(self, item):
+        external_id = getattr(item, self.external_key)
+        if self.by_external.get(external_id) is item:
+            del self.by_external[external_id]
+        key = normalize_title(item.title)
+        bucket = self.by_title.get(key)
+        if bucket:
+            bucket[:] = [i for i in bucket if i is not item]
+            if not bucket:
+                del self.by_title[key]
+                for gram in trigrams(key):
+                    keys = self.by_trigram.get(gram)
+                    if keys is not None:
+                        keys.discard(key)
+                        if not keys:
+                            del self.by_trigram[gram]
+                pos = bisect.bisect_left(self.sorted_titles, key)
+                if pos < len(self.sorted_titles) and self.sorted_titles[pos] == key:
+                    del self.sorted_titles[pos]
+
+    def restore(self, items):
+        # Seed an empty index from the on-disk snapshot (sorting once); the first live refresh reconciles it
+        for item in items:
+            self.by_id[item.id] = item
+            external_id = getattr(item, self.external_key)
+            if external_id:
+                self.by_external[external_id] = item
+            key = normalize_title(item.title)
+            if key:
+                self.by_title.setdefault(key, []).append(item)
+        self.sorted_titles = sorted(self.by_title)
+        for key in self.sorted_titles:
+            for gram in trigrams(key):
+                self.by_trigram.setdefault(gram, set()).add(key)
+
+    def apply_snapshot(self, items):
+        # Only touch entries that changed so readers never see a half-built index
+        seen = set()
+        for item in items:
+            item_id = item.id
+            if item_id is None:
+                continue
+            seen.add(item_id)
+            if self.by_id.get(item_id) != item:
+                self.upsert(item)
+        for item_id in [i for i in self.by_id if i not in seen]:
+            self.remove(item_id)
+        self.ready = True
+        self.last_refresh = time.monotonic()
+
+    def get_by_external(self, external_id):
+        return self.by_external.get(external_id)
+
+    def get_by_id(self, item_id):
+        return self.by_id.get(item_id)
+
+    def find_by_title(self, title):
+        return list(self.by_title.get(normalize_title(title), []))
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        # Title prefix first, then word prefix, then fuzzy; no network involved
+        q = normalize_title(query)
+        if not q:
+            return []
+        keys = []
+        pos = bisect.bisect_left(self.sorted_titles, q)
+        while pos < len(self.sorted_titles) and self.sorted_titles[pos].startswith(q) and len(keys) < limit:
+            keys.append(self.sorted_titles[pos])
+            pos += 1
+        if len(keys) < limit:
+            needle = " " + q
+            for key in self.word_candidates(needle):
+                if needle in " " + key and key not in keys:
+                    keys.append(key)
+                    if len(keys) >= limit:
+                        break
+        if len(keys) < limit:
+            # difflib over the whole library would block the loop on every keystroke
+            for key in difflib.get_close_matches(q, self.fuzzy_candidates(q), n=limit, cutoff=0.6):
+                if key not in keys:
+                    keys.append(key)
+        out = []
+        for key in keys:
+            out.extend(self.by_title.get(key, []))
+        return out[:limit]
+
+    def word_candidates(self, needle):
+        # Titles holding every trigram of the needle, in title order; a scan for needles too short to have one
+        grams = [needle[i:i + 3] for i in range(len(needle) - 2)]
+        if not grams:
+            return self.sorted_titles
+        postings = sorted((self.by_trigram.get(gram, set()) for gram in grams), key=len)
+        return sorted(postings[0].intersection(*postings[1:]))
+
+    def fuzzy_candidates(self, q, size=FUZZY_CANDIDATES):
+        # Ranked by shared trigrams relative to both lengths (Dice), which tracks difflib's ratio closely
+        grams = trigrams(q)
+        counts = {}
+        for gram in grams:
+            for key in self.by_trigram.get(gram, ()):
+                counts[key] = counts.get(key, 0) + 1
+        return heapq.nlargest(size, counts, key=lambda key: counts[key] / (len(key) + 2 + len(grams)))
+
+    async def refresh(self):
+        items = await self.fetch_all()
+        if items is None:
+            logging.warning(f"{self.name} refresh failed; keeping the current index")
+            return False
+        self.apply_snapshot(items)
+        logging.info(f"{self.name} index holds {len(self)} item(s)")
+        return True
+
+# ------------- Library snapshot -------------
+# Compact copy of every index and of the last episode lists seen, kept in SQLite next to
+# config.yml. Loaded at boot so autocomplete and menus work before the first refresh answers.
+# Rows are the records' snapshot_fields; overviews and images come back with the first live refresh.
+
+class LibrarySnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")  # one writer, in order
+        self.stored = {}  # instance -> {id: json} as on disk, so refreshes only write what changed
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SNAPSHOT_SCHEMA_VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS items;
+                DROP TABLE IF EXISTS episodes;
+                CREATE TABLE items (instance TEXT, id INTEGER, data TEXT, PRIMARY KEY (instance, id));
+                CREATE TABLE episodes (instance TEXT, series_id INTEGER, season INTEGER, data TEXT, updated REAL,
+                                       PRIMARY KEY (instance, series_id, season));
+            """)
+            self.db.execute(f"PRAGMA user_version={SNAPSHOT_SCHEMA_VERSION}")
+            self.db.commit()
+        # Small bits of bot state that should survive a restart; kept when the item schema changes
+        self.db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+    def load(self, instance, record_type):
+        rows = self.db.execute("SELECT id, data FROM items WHERE instance=?", (instance,)).fetchall()
+        self.stored[instance] = dict(rows)
+        # One parse instead of one per row
+        return [record_type.from_row(instance, row) for row in json.loads("[" + ",".join(data for _, data in rows) + "]")]
+
+    def prune(self, instances):
+        self.writer.submit(self._run, self._prune, instances)
+
+    def _prune(self, instances):
+        # Forget instances that are no longer configured
+        marks = ",".join("?" * len(instances))
+        with self.db:
+            self.db.execute(f"DELETE FROM items WHERE instance NOT IN ({marks})", instances)
+            self.db.execute(f"DELETE FROM episodes WHERE instance NOT IN ({marks})", instances)
+
+    def save_items(self, instance, items):
+        self.writer.submit(self._run, self._save_items, instance, items)
+
+    def save_episodes(self, instance, series_id, season, episodes):
+        self.writer.submit(self._run, self._save_episodes, instance, series_id, season, episodes)
+
+    def save_state(self, key, value):
+        self.writer.submit(self._run, self._save_state, key, value)
+
+    async def state(self, key):
+        loop = asyncio.get_running_loop()
+        row = await loop.run_in_executor(self.writer, self._state, key)
+        return row[0] if row else None
+
+    async def episodes(self, instance, series_id, season):
+        loop = asyncio.get_running_loop()
+        row = await loop.run_in_executor(self.writer, self._episodes, instance, series_id, season)
+        return [EpisodeRecord.from_row(None, ep) for ep in json.loads(row[0])] if row else None
+
+    def close(self):
+        self.writer.shutdown(wait=True)
+        self.db.close()
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logging.error(f"Snapshot write failed: {e}")
+
+    def _save_items(self, instance, items):
+        stored = self.stored.setdefault(instance, {})
+        fresh = {item.id: json.dumps(item.row(), separators=(",", ":")) for item in items if item.id}
+        changed = [(instance, i, data) for i, data in fresh.items() if stored.get(i) != data]
+        removed = [(instance, i) for i in stored if i not in fresh]
+        if not changed and not removed:
+            return
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO items (instance, id, data) VALUES (?, ?, ?)", changed)
+            self.db.executemany("DELETE FROM items WHERE instance=? AND id=?", removed)
+        self.stored[instance] = fresh
+        logging.info(f"{instance} snapshot: {len(changed)} changed, {len(removed)} removed")
+
+    def _save_episodes(self, instance, series_id, season, episodes):
+        data = json.dumps([ep.row() for ep in episodes], separators=(",", ":"))
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO episodes (instance, series_id, season, data, updated) VALUES (?, ?, ?, ?, ?)",
+                            (instance, series_id, season, data, time.time()))
+
+    def _save_state(self, key, value):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    def _state(self, key):
+        return self.db.execute("SELECT value FROM state WHERE key=?", (key,)).fetchone()
+
+    def _episodes(self, instance, series_id, season):
+        return self.db.execute("SELECT data FROM episodes WHERE instance=? AND series_id=? AND season=?",
+                               (instance, series_id, season)).fetchone()
+
+def open_snapshot(location, instances):
+    # Loading is a handful of indexed reads; a broken file only costs the warm start
+    start = time.monotonic()
+    try:
+        snapshot = LibrarySnapshot(location)
+        snapshot.prune([inst.name for inst in instances])
+        for inst in instances:
+            inst.index.restore(snapshot.load(inst.name, inst.record_type))
+    except Exception as e:
+        logging.error(f"Could not open library snapshot {location}: {e}")
+        return None
+    logging.info(f"Loaded library snapshot in {(time.monotonic() - start) * 1000:.0f} ms "
+                 f"({', '.join(f'{inst.name}: {len(inst.index)}' for inst in instances)})")
+    return snapshot
+
+# ------------- Regrab queue -------------
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class RegrabTicket:
+    def __init__(self):
+        self.fresh = []    # keys queued by this submit
+        self.merged = []   # keys already in flight; we wait on that job instead
+        self.cooling = []  # keys regrabbed too recently; skipped
+        self.futures = []
+
+    async def wait(self):
+        # shield: a cancelled caller must not cancel a job other users are waiting on
+        return await asyncio.gather(*(asyncio.shield(f) for f in self.futures))
+
+class RegrabQueue:
+    # Worker pool per *arr instance. Jobs are keyed (e.g. ("movie", tmdbId)) so the
+    # same item is never regrabbed twice at once or again within the cooldown.
+    def __init__(self, name, concurrency, requests_per_second, cooldown):
+        self.name = name
+        self.concurrency = 0
+        self.limiter = None
+        self.queue = None
+        self.workers = []
+        self.inflight = {}
+        self.finished = {}
+        self.configure(concurrency, requests_per_second, cooldown)
+
+    def configure(self, concurrency, requests_per_second, cooldown):
+        # Also used on a config reload: jobs already running keep the limiter they started with
+        concurrency = max(1, int(concurrency))
+        rate = 1.0 / self.limiter.interval if self.limiter else 0
+        if (requests_per_second or 0) != rate:
+            self.limiter = RateLimiter(requests_per_second) if requests_per_second else None
+        self.cooldown = cooldown
+        if self.queue is not None:
+            if concurrency > self.concurrency:
+                self.workers += [asyncio.create_task(self._worker()) for _ in range(concurrency - self.concurrency)]
+            for _ in range(self.concurrency - concurrency):
+                self.queue.put_nowait(None)  # retires one worker once it is done with its current job
+        self.concurrency = concurrency
+
+    def start(self):
+        # Queue is created here so it binds to the running loop
+        self.queue = asyncio.Queue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        # Jobs still queued will never run; fail them so nobody waits on them, or merges into them later
+        while self.queue is not None and not self.queue.empty():
+            job = self.queue.get_nowait()
+            if job is not None and not job[2].done():
+                job[2].set_result((False, "error", None))
+        self.inflight.clear()
+        self.queue = None
+
+    def pending(self):
+        return self.queue.qsize() if self.queue else 0
+
+    def cooldown_remaining(self, key):
+        done = self.finished.get(key)
+        if done is None:
+            return 0
+        left = self.cooldown - (time.monotonic() - done)
+        if left <= 0:
+            del self.finished[key]
+            return 0
+        return left
+
+    def submit(self, keys, run):
+        # run(keys) -> (ok, status, watch); it only receives the keys nobody else is handling
+        ticket = RegrabTicket()
+        for key in dict.fromkeys(keys):
+            if self.cooldown_remaining(key):
+                ticket.cooling.append(key)
+            elif key in self.inflight:
+                ticket.merged.append(key)
+                if self.inflight[key] not in ticket.futures:
+                    ticket.futures.append(self.inflight[key])
+            else:
+                ticket.fresh.append(key)
+        if ticket.fresh:
+            future = asyncio.get_running_loop().create_future()
+            if self.queue is None:
+                # Stopped, e.g. the instance was removed from config.yml while a menu was still open
+                future.set_result((False, "error", None))
+                ticket.futures.append(future)
+                return ticket
+            for key in ticket.fresh:
+                self.inflight[key] = future
+            self.queue.put_nowait((ticket.fresh, run, future, current_trace.get()))
+            ticket.futures.append(future)
+        return ticket
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                self.workers.remove(asyncio.current_task())
+                return
+            keys, run, future, trace = job
+            request_limiter.set(self.limiter)
+            current_trace.set(trace)  # the job logs under the flow that queued it
+            try:
+                result = await run(keys)
+                if result[0]:
+                    now = time.monotonic()
+                    for key in keys:
+                        self.finished[key] = now
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                logging.error(f"{self.name} regrab job {keys} failed: {e}")
+                if not future.done():
+                    future.set_result((False, "error", None))
+            finally:
+                for key in keys:
+                    if self.inflight.get(key) is future:
+                        del self.inflight[key]
+                self.queue.task_done()
+
+
+COOLDOWN_MESSAGE = "⏳ **{user}** — {label} was re-grabbed recently. Try again in {minutes} min."
+MERGED_MESSAGE = "🔁 **{user}** — {label} is already being re-grabbed; following that request…"
+QUEUED_MESSAGE = "⏳ **{user}** — {label} is queued behind {pending} other re-grab(s)…"
+# A regrab that merged into a library sweep's job: the sweep only searches, so the file was kept
+SWEEP_MERGED_MESSAGE = "🔎 **{user}** — a library sweep already started a search for {label}; the existing file was kept."
+
+async def run_regrab(queue, keys, run, status_msg, user, label, messages):
+    ticket = queue.submit(keys, run)
+    if not ticket.futures:
+        minutes = max(1, round(max(queue.cooldown_remaining(k) for k in ticket.cooling) / 60))
+        await status_msg.edit(content=COOLDOWN_MESSAGE.format(user=user, label=label, minutes=minutes))
+        return
+    ahead = queue.pending() - (1 if ticket.fresh else 0)
+    if ticket.merged and not ticket.fresh:
+        await status_msg.edit(content=MERGED_MESSAGE.format(user=user, label=label))
+    elif ahead > 0:
+        await status_msg.edit(content=QUEUED_MESSAGE.format(user=user, label=label, pending=ahead))
+    results = await ticket.wait()
+    status = next((st for ok, st, _ in results if not ok), results[0][1])
+    await status_msg.edit(content=messages.get(status, messages["error"]).format(user=user, label=label))
+    for ok, _, watch in results:
+        if ok and watch:
+            command_poller.track(watch, status_msg, user, label)
+
+# ------------- *arr instances -------------
+class ArrInstance:
+    # One Radarr or Sonarr server: its settings, connection pool, lookup cache, library index and regrab queue
+    def __init__(self, app, cfg, name, multiple):
+        self.app = app
+        self.cfg = None
+        self.name = name
+        self.external_key = "tmdb_id" if app == "radarr" else "tvdb_id"
+        self.record_type = MovieRecord if app == "radarr" else SeriesRecord
+        self.queue_id_field = "movieId" if app == "radarr" else "episodeId"
+        self.lookup_cache = LookupCache(f"{name}_lookup", lookup_cache_ttl, lookup_cache_size)
+        self.episode_cache = LookupCache(f"{name}_episodes", episode_cache_ttl, episode_cache_size)
+        self.index = LibraryIndex(name, self.external_key, self.fetch_library)
+        self.index_refresher = tasks.loop(minutes=DEFAULT_INDEX_REFRESH_MINUTES)(self.refresh_index)
+        self.queue = RegrabQueue(name, DEFAULT_REGRAB_CONCURRENCY, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_REGRAB_COOLDOWN)
+        self.breaker = CircuitBreaker(name, on_change=breaker_changed)
+        ARR_CIRCUIT_STATE.labels(name).set(0)
+        self._session = None
+        self.retired_sessions = set()
+        self.discovery = None
+        self.configure(cfg, multiple)
+
+    def configure(self, cfg, multiple):
+        # Applies an instance's config; reload_config() calls it again on a running instance. Every
+        # change is a plain attribute swap, so requests already in flight finish with what they started with.
+        base_url, api_key = normalize_base_url(cfg["url"]), cfg["api_key"]
+        pool_size = cfg.get("pool_size", HTTP_POOL_SIZE)
+        keepalive_timeout = cfg.get("keepalive_timeout", HTTP_KEEPALIVE_TIMEOUT)
+        moved = self.cfg is not None and (base_url, api_key) != (self.base_url, self.api_key)
+        if moved or (self.cfg is not None and (pool_size, keepalive_timeout) != (self.pool_size, self.keepalive_timeout)):
+            self.retire_session()
+        self.cfg = cfg
+        self.base_url, self.api_key = base_url, api_key
+        self.pool_size, self.keepalive_timeout = pool_size, keepalive_timeout
+        self.quality_profile_id = cfg.get("qualityprofileid")
+        self.root_folder_path = cfg.get("root_path")
+        self.suffix = f" [{self.name}]" if multiple else ""  # tells instances apart in menus and messages
+        self.regrab_mode = cfg.get("regrab_mode", "search")
+        if self.regrab_mode not in REGRAB_MODES:
+            logging.warning(f"Unknown regrab_mode {self.regrab_mode!r} for {self.name}; using 'search'")
+            self.regrab_mode = "search"
+        self.retries = cfg.get("retries", DEFAULT_RETRIES)
+        self.queue.configure(cfg.get("regrab_concurrency", DEFAULT_REGRAB_CONCURRENCY),
+                             cfg.get("requests_per_second", DEFAULT_REQUESTS_PER_SECOND),
+                             cfg.get("regrab_cooldown", DEFAULT_REGRAB_COOLDOWN))
+        self.lookup_cache.ttl, self.lookup_cache.maxsize = lookup_cache_ttl, lookup_cache_size
+        self.episode_cache.ttl, self.episode_cache.maxsize = episode_cache_ttl, episode_cache_size
+        minutes = cfg.get("index_refresh_minutes", DEFAULT_INDEX_REFRESH_MINUTES)
+        if minutes != self.index_refresher.minutes:
+            self.index_refresher.change_interval(minutes=minutes)
+        if moved:
+            # Possibly a different server now: forget what the old one told us
+            self.lookup_cache.invalidate()
+            self.episode_cache.invalidate()
+            self.breaker.record_success()
+            if self.index_refresher.is_running():
+                self.index_refresher.restart()
+
+    def retire_session(self):
+        # New requests get a fresh pool; the old one is closed once its requests are done
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            self.retired_sessions.add(session)
+            asyncio.ensure_future(self.close_later(session))
+
+    async def close_later(self, session):
+        await asyncio.sleep(SESSION_DRAIN_SECONDS)
+        self.retired_sessions.discard(session)
+        await session.close()
+
+    def http_session(self):
+        if self._session is None or self._session.closed:
+            self._session = new_http_session(self.pool_size, self.keepalive_timeout)
+        return self._session
+
+    async def close(self):
+        for session in [self._session, *self.retired_sessions]:
+            if session is not None and not session.closed:
+                await session.close()
+        self._session = None
+        self.retired_sessions.clear()
+
+    def start(self):
+        # First index refresh runs immediately and warms it
+        self.index_refresher.start()
+        self.queue.start()
+
+    async def stop(self):
+        self.index_refresher.cancel()
+        await self.queue.stop()
+        if self.discovery is not None:
+            self.discovery.cancel()
+
+    async def refresh_index(self):
+        if await self.index.refresh() and library_snapshot:
+            library_snapshot.save_items(self.name, list(self.index.by_id.values()))
+
+    def needs_discovery(self):
+        return not (self.quality_profile_id and self.root_folder_path)
+
+    async def discover(self, persist=False):
+        # Retried with backoff, so an instance that is briefly down no longer takes the bot with it
+        delay = DISCOVERY_RETRY_DELAY
+        for attempt in range(1, DISCOVERY_ATTEMPTS + 1):
+            try:
+                profile, root = await asyncio.wait_for(
+                    asyncio.gather(get_first_quality_profile(self), get_root_folder(self)), DISCOVERY_TIMEOUT)
+            except Exception as e:
+                logging.warning(f"Discovery for {self.name} failed (attempt {attempt}/{DISCOVERY_ATTEMPTS}): {e}")
+                if attempt < DISCOVERY_ATTEMPTS:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+                continue
+            # Values already in the config win; only the missing ones are filled in
+            self.quality_profile_id = self.cfg["qualityprofileid"] = self.quality_profile_id or profile
+            self.root_folder_path = self.cfg["root_path"] = self.root_folder_path or root
+            logging.info(f"Using qualityprofileid={self.quality_profile_id}, root_path={self.root_folder_path} for {self.name}")
+            if persist:
+                save_config(config_location, config)
+            return True
+        logging.error(f"Could not discover settings for {self.name}; adding new items stays disabled until it responds")
+        return False
+
+    def discovery_task(self, persist=False):
+        # One discovery at a time; a finished, failed one is started again on the next call
+        if self.discovery is None or (self.discovery.done() and (self.discovery.cancelled() or not self.discovery.result())):
+            self.discovery = asyncio.ensure_future(self.discover(persist))
+        return self.discovery
+
+    async def ensure_discovered(self):
+        # Adding a movie/series needs the profile and root folder; give discovery a moment if it is still running
+        if not self.needs_discovery():
+            return True
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.discovery_task(persist=True)), DISCOVERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+
+    async def fetch_library(self):
+        return await (radarr_movies_all(self) if self.app == "radarr" else sonarr_series_all(self))
+
+    async def fetch_commands(self):
+        return await (radarr_commands(self) if self.app == "radarr" else sonarr_commands(self))
+
+    async def fetch_queue(self):
+        return await (radarr_queue_details(self) if self.app == "radarr" else sonarr_queue_details(self))
+
+def breaker_changed(breaker):
+    ARR_CIRCUIT_STATE.labels(breaker.name).set(BREAKER_STATES.index(breaker.state))
+    if bot and bot.is_ready():
+        asyncio.ensure_future(update_presence())
+
+async def update_presence():
+    # Show unreachable instances in the bot's status so users know before they try
+    down = [inst.name for inst in arr_instances.values() if inst.breaker.state != "closed"]
+    try:
+        if down:
+            await bot.change_presence(status=discord.Status.idle,
+                                      activity=discord.Game(f"⚠️ {', '.join(down)} unreachable"))
+        else:
+            await bot.change_presence(status=discord.Status.online, activity=None)
+    except Exception as e:
+        logging.error(f"Failed to update presence: {e}")
+
+def unreachable(instances):
+    return [inst.name for inst in instances if inst.breaker.is_open()]
+
+def instance_names(app, configs):
+    # -> [(name, cfg)] and whether there are several
+    multiple = len(configs) > 1
+    return [(cfg.get("name") or (f"{app}{i + 1}" if multiple else app), cfg) for i, cfg in enumerate(configs)], multiple
+
+def build_instances(app, configs):
+    named, multiple = instance_names(app, configs)
+    return [ArrInstance(app, cfg, name, multiple) for name, cfg in named]
+
+radarr_instances = []
+sonarr_instances = []
+arr_instances = {}
+prometheus_client.REGISTRY.register(CacheCollector())
+
+def interleave(instances, result_lists, limit=MAX_SELECT_OPTIONS):
+    # Round-robin so every instance's best matches make the cut
+    merged = []
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for inst, items in zip(instances, result_lists):
+            if rank < len(items):
+                merged.append(items[rank])
+    return merged[:limit]
+
+async def fan_out(instances, fetch):
+    # Ask every instance at once, so latency is bounded by the slowest one rather than the sum
+    return interleave(instances, await asyncio.gather(*(fetch(inst) for inst in instances)), limit=None)
+
+def item_instance(item):
+    return arr_instances[item.instance]
+
+# ------------- Command status poller -------------
+# One loop follows every outstanding regrab. Each tick costs at most one GET /command
+# and one GET /queue/details per instance, however many regrabs are being watched.
+WATCH_MESSAGES = {
+    "queued": "⏳ **{user}** — search for {label} is queued.",
+    "started": "🔎 **{user}** — searching for {label}…",
+    "grabbed": "📥 **{user}** — grabbed {label}; downloading{progress}…",
+    "completed": "✅ **{user}** — {label} downloaded.",
+    "not_found": "⚠️ **{user}** — search for {label} finished but no release was grabbed.",
+    "failed": "❌ **{user}** — re-grab of {label} failed: {detail}",
+}
+FINAL_STATES = ("completed", "not_found", "failed")
+REPORTS_DOWNLOADED = re.compile(r"(\d+) reports? downloaded")
+
+def reports_downloaded(command):
+    # "Movie search completed. 1 reports downloaded." -> 1; None when the message doesn't say
+    match = REPORTS_DOWNLOADED.search(command.get("message") or "")
+    return int(match.group(1)) if match else None
+
+def command_watch(inst, resp, item_ids):
+    body = resp.json() or {}
+    return {"app": inst.name, "command_id": body.get("id"), "item_ids": list(item_ids)}
+
+def added_movie_watch(inst, add_resp):
+    # Re-adds search via addOptions, so there is no command id; follow the download queue only
+    body = add_resp.json() or {}
+    return {"app": inst.name, "command_id": None, "item_ids": [body["id"]]} if body.get("id") else None
+
+class Watch:
+    def __init__(self, app, command_id, item_ids):
+        self.app = app
+        self.command_id = command_id
+        self.item_ids = set(item_ids)
+        self.state = "queued" if command_id else "started"
+        self.progress = 0
+        self.detail = ""
+        self.seen_in_queue = False
+        self.pushed = False       # driven by webhook events; no need to poll
+        self.downloaded = set()
+        self.created = time.monotonic()
+        self.searched_at = None   # when the search command completed
+        self.messages = []  # [status_msg, user, label, last rendered content]
+
+    def render(self, user, label):
+        progress = f" ({self.progress}%)" if self.progress else ""
+        return WATCH_MESSAGES[self.state].format(user=user, label=label, progress=progress, detail=self.detail)
+
+class CommandPoller:
+    # Watches are keyed by instance name ("app"), so each *arr server is polled separately
+    def __init__(self, instances):
+        self.instances = instances
+        self.watches = {}
+        self.wakeup = None
+        self.task = None
+        self.interval = POLL_MIN_INTERVAL
+
+    def start(self):
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def track(self, watch, status_msg, user, label):
+        key = (watch["app"], watch["command_id"], frozenset(watch["item_ids"]))
+        tracked = self.watches.get(key)
+        if tracked is None:
+            tracked = self.watches[key] = Watch(watch["app"], watch["command_id"], watch["item_ids"])
+        tracked.messages.append([status_msg, user, label, None])
+        self.interval = POLL_MIN_INTERVAL
+        if self.wakeup:
+            self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self.watches:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                changed = await self.poll_once()
+            except Exception as e:
+                logging.error(f"Command poller tick failed: {e}")
+                changed = False
+            self.interval = POLL_MIN_INTERVAL if changed else min(self.interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+    async def poll_once(self):
+        apps = {w.app for w in self.watches.values() if not w.pushed and w.app in self.instances}
+        results = await asyncio.gather(*(self._poll_app(app) for app in apps))
+        changed = any(results)
+        now = time.monotonic()
+        for key, watch in list(self.watches.items()):
+            # An instance removed from config.yml can't be followed any further
+            if watch.state in FINAL_STATES or now - watch.created > WATCH_TIMEOUT or watch.app not in self.instances:
+                del self.watches[key]
+        return changed
+
+    async def on_event(self, app, item_ids, state, detail=None):
+        # Webhook push; returns how many watches it updated
+        item_ids = set(item_ids)
+        matched = [w for w in self.watches.values() if w.app == app and w.item_ids & item_ids]
+        for w in matched:
+            w.pushed = True
+            w.command_id = None
+            if state == "grabbed":
+                w.seen_in_queue = True
+                self._set(w, "grabbed")
+            elif state == "completed":
+                w.downloaded |= item_ids
+                if w.item_ids <= w.downloaded:
+                    self._set(w, "completed")
+            else:
+                self._set(w, state, detail=detail)
+            await self._render(w)
+        for key, w in list(self.watches.items()):
+            if w.state in FINAL_STATES:
+                del self.watches[key]
+        return len(matched)
+
+    async def _poll_app(self, app):
+        inst = self.instances[app]
+        watches = [w for w in self.watches.values() if w.app == app and not w.pushed]
+        changed = False
+
+        if any(w.state in ("queued", "started") and w.command_id for w in watches):
+            resp = await inst.fetch_commands()
+            commands = {c.get("id"): c for c in (resp.json() or [])} if resp else {}
+            for w in watches:
+                if not w.command_id or w.state not in ("queued", "started"):
+                    continue
+                command = commands.get(w.command_id)
+                if command is None:
+                    continue
+                status = command.get("status")
+                if status in ("failed", "aborted", "cancelled", "orphaned"):
+                    changed |= self._set(w, "failed", detail=command.get("message") or status)
+                elif status == "completed":
+                    w.command_id = None  # search done; now follow the download queue
+                    w.detail = "searched"
+                    w.searched_at = time.monotonic()
+                    grabs = reports_downloaded(command)
+                    if grabs == 0:
+                        self._set(w, "not_found")
+                    elif grabs:
+                        self._set(w, "grabbed")  # on its way to the queue
+                    changed = True
+                elif status == "started":
+                    changed |= self._set(w, "started")
+
+        if any(not w.command_id and w.state not in FINAL_STATES for w in watches):
+            resp = await inst.fetch_queue()
+            queue = resp.json() if resp else None
+            if queue is not None:
+                by_item = {}
+                for entry in queue:
+                    by_item.setdefault(entry.get(inst.queue_id_field), []).append(entry)
+                for w in watches:
+                    if w.command_id or w.state in FINAL_STATES:
+                        continue
+                    entries = [e for i in w.item_ids for e in by_item.get(i, [])]
+                    changed |= self._apply_queue(w, entries)
+
+        for w in watches:
+            await self._render(w)
+        return changed
+
+    def _apply_queue(self, watch, entries):
+        if entries:
+            watch.seen_in_queue = True
+            broken = [e for e in entries if e.get("trackedDownloadStatus") == "error"
+                      or e.get("trackedDownloadState") in ("failed", "failedPending")]
+            if broken:
+                return self._set(watch, "failed", detail=broken[0].get("errorMessage") or "download failed")
+            size = sum(e.get("size") or 0 for e in entries)
+            left = sum(e.get("sizeleft") or 0 for e in entries)
+            progress = int(100 * (size - left) / size) if size else 0
+            return self._set(watch, "grabbed", progress=progress)
+        if watch.seen_in_queue:
+            return self._set(watch, "completed")
+        if watch.state == "grabbed":
+            return False  # the search reported a grab; wait for it to show up
+        now = time.monotonic()
+        if ((watch.searched_at is not None and now - watch.searched_at > QUEUE_GRACE)
+                or now - watch.created > READD_SEARCH_WINDOW):
+            # Search finished and nothing reached the download client
+            return self._set(watch, "not_found")
+        return False
+
+    def _set(self, watch, state, progress=None, detail=None):
+        before = (watch.state, watch.progress)
+        watch.state = state
+        if progress is not None:
+            watch.progress = progress
+        if detail is not None:
+            watch.detail = detail
+        return before != (watch.state, watch.progress)
+
+    async def _render(self, watch):
+        for entry in list(watch.messages):
+            status_msg, user, label, last = entry
+            content = watch.render(user, label)
+            if content == last:
+                continue
+            try:
+                await status_msg.edit(content=content)
+                entry[3] = content
+            except discord.errors.NotFound:
+                watch.messages.remove(entry)  # message deleted; stop updating it
+            except Exception as e:
+                logging.error(f"Failed to update regrab status: {e}")
+
+command_poller = CommandPoller(arr_instances)  # shares the dict load_config() fills in
+
+# ------------- Webhook receiver -------------
+# Radarr/Sonarr push Grab/Download events to /webhook/<instance name> so status messages
+# update without polling.
+WEBHOOK_STATES = {
+    "Grab": "grabbed",
+    "Download": "completed",
+    "ImportFailed": "failed",
+    "DownloadFailed": "failed",
+    "ManualInteractionRequired": "failed",
+}
+
+def webhook_item_ids(inst, payload):
+    # Anything that isn't shaped like a Radarr/Sonarr payload simply matches nothing
+    if inst.app == "radarr":
+        movie = payload.get("movie")
+        return [movie["id"]] if isinstance(movie, dict) and movie.get("id") else []
+    episodes = payload.get("episodes")
+    return [ep["id"] for ep in episodes if isinstance(ep, dict) and ep.get("id")] if isinstance(episodes, list) else []
+
+class WebhookServer:
+    def __init__(self, token=None):
+        self.token = token
+
+    def add_routes(self, app):
+        app.router.add_post("/webhook/{app}", self.handle)
+
+    def authorized(self, request):
+        if not self.token:
+            return True
+        if request.query.get("token") == self.token:
+            return True
+        auth = request.headers.get("Authorization", "")
+        if auth.startswith("Basic "):
+            try:
+                return aiohttp.BasicAuth.decode(auth).password == self.token
+            except ValueError:
+                return False
+        return False
+
+    async def handle(self, request):
+        app = request.match_info["app"]
+        inst = arr_instances.get(app)
+        if inst is None:
+            raise web.HTTPNotFound()
+        if not self.authorized(request):
+            raise web.HTTPUnauthorized()
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest()
+        if not isinstance(payload, dict):
+            raise web.HTTPBadRequest()
+        event = payload.get("eventType")
+        state = WEBHOOK_STATES.get(event)
+        if state:
+            detail = payload.get("message") or event
+            matched = await command_poller.on_event(app, webhook_item_ids(inst, payload), state, detail)
+            logging.info(f"{app} webhook {event}: updated {matched} regrab(s)")
+        return web.json_response({"ok": True})
+
+webhook_server = WebhookServer()
+
+# ------------- Embedded HTTP server -------------
+class HttpServer:
+    # Webhooks and /metrics share one aiohttp app; each configured (host, port) gets a site
+    def __init__(self):
+        self.runner = None
+
+    async def start(self, listeners):
+        if not listeners:
+            return
+        app = web.Application()
+        for add_routes in {fn for fns in listeners.values() for fn in fns}:
+            add_routes(app)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        for host, port in listeners:
+            await web.TCPSite(self.runner, host, port).start()
+            logging.info(f"HTTP server listening on {host}:{port}")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+def add_metrics_routes(app):
+    app.router.add_get("/metrics", handle_metrics)
+
+def http_listeners():
+    listeners = {}
+    if webhook_config.get("port"):
+        key = (webhook_config.get("host", "0.0.0.0"), int(webhook_config["port"]))
+        listeners.setdefault(key, []).append(webhook_server.add_routes)
+    if metrics_config.get("port"):
+        key = (metrics_config.get("host", "0.0.0.0"), int(metrics_config["port"]))
+        listeners.setdefault(key, []).append(add_metrics_routes)
+    return listeners
+
+http_server = HttpServer()
+
+# ------------- Paged pickers -------------
+# A select menu holds at most 25 options. Pickers keep the full list but only build options
+# for the page on screen; the ◀/▶ buttons re-render the view for the neighbouring page.
+class TracedView(View):
+    # Each component click runs in a fresh task; pick the flow's trace back up before the callback
+    async def interaction_check(self, interaction):
+        resume_trace(self.media_info)
+        return True
+
+class PagedView(TracedView):
+    page_size = MAX_SELECT_OPTIONS
+
+    def __init__(self, items, media_info, page=0):
+        super().__init__(timeout=180)
+        self.items = items
+        self.media_info = media_info
+        self.page = page
+        self.render()
+
+    @property
+    def pages(self):
+        return max(1, -(-len(self.items) // self.page_size))
+
+    def make_select(self, start, page_items):
+        raise NotImplementedError
+
+    def render(self):
+        self.clear_items()
+        start = self.page * self.page_size
+        self.add_item(self.make_select(start, self.items[start:start + self.page_size]))
+        if self.pages > 1:
+            self.add_button("◀", self.previous_page, disabled=self.page == 0)
+            self.add_button(f"{self.page + 1}/{self.pages}", None, disabled=True)
+            self.add_button("▶", self.next_page, disabled=self.page >= self.pages - 1)
+
+    def add_button(self, label, callback, disabled=False):
+        button = Button(style=discord.ButtonStyle.secondary, label=label, disabled=disabled, row=1)
+        if callback:
+            button.callback = callback
+        self.add_item(button)
+
+    async def show_page(self, interaction, page):
+        self.page = max(0, min(page, self.pages - 1))
+        self.render()
+        try:
+            await interaction.response.edit_message(view=self)
+        except discord.errors.NotFound:
+            pass
+
+    async def previous_page(self, interaction):
+        await self.show_page(interaction, self.page - 1)
+
+    async def next_page(self, interaction):
+        await self.show_page(interaction, self.page + 1)
 
 # ------------- MOVIE REGRAB FLOW -------------
 async def fetch_movie_list(movie_name):
-    resp = radarr_lookup(movie_name)
-    if resp and resp.status_code == 200:
-        return resp.json()[:10]
-    return []
+    async def lookup(inst):
+        async def fetch():
+            resp = await radarr_lookup(inst, movie_name)
+            if resp and resp.status_code == 200:
+                return resp.records
+            return None
+        return await inst.lookup_cache.get_or_fetch(normalize_term(movie_name), fetch) or []
+    return await fan_out(radarr_instances, lookup)
+
+MOVIE_MESSAGES = {
+    "delete_failed": "❌ **{user}** — couldn’t delete {label} from Radarr.",
+    "searching": "🔎 **{user}** — re-grabbing {label} (deleted file & started search).",
+    "search_started": SWEEP_MERGED_MESSAGE,
+    "monitored": "🔎 **{user}** — re-grabbing {label} (it wasn’t monitored, so it is now; deleted file & started search).",
+    "monitor_failed": "❌ **{user}** — couldn’t set {label} to monitored in Radarr, so it was left untouched.",
+    "regrabbing": "🔎 **{user}** — re-grabbing {label} (deleted & started search).",
+    "requested": "🔎 **{user}** — requested {label} and started search.",
+    "request_failed": "❌ **{user}** — request for {label} failed. Try again later.",
+    "error": "❌ **{user}** — re-grab failed for {label}.",
+    "not_ready": "⏳ **{user}** — still connecting to Radarr; try {label} again in a minute.",
+    "unreachable": "⚠️ **{user}** — Radarr isn’t responding, so {label} was left untouched. Try again in a bit.",
+}
+
+async def regrab_movie_files(inst, movies):
+    # Movies already in Radarr: one bulk delete of their files and a single MoviesSearch
+    unmonitored = [m for m in movies if not m.monitored]
+    if unmonitored:
+        # Radarr skips unmonitored movies in a search; monitoring them keeps their tags, profile and history
+        resp = await radarr_monitor_movies(inst, [m.id for m in unmonitored])
+        if not (resp and 200 <= resp.status_code < 400):
+            return False, "monitor_failed", None
+        for m in unmonitored:
+            m.monitored = True
+    file_ids = [m.movie_file_id for m in movies if m.movie_file_id]
+    if file_ids:
+        del_resp = await radarr_delete_moviefiles(inst, file_ids)
+        if not (del_resp and 200 <= del_resp.status_code < 400):
+            return None
+    movie_ids = [m.id for m in movies]
+    search_resp = await radarr_movies_search(inst, movie_ids)
+    if search_resp and 200 <= search_resp.status_code < 400:
+        return True, "monitored" if unmonitored else "searching", command_watch(inst, search_resp, movie_ids)
+    return None
 
-class ConfirmButtonsMovie(View):
+async def regrab_movie_job(inst, movie):
+    if inst.breaker.is_open():
+        return False, "unreachable", None
+    tmdb_id = movie.tmdb_id
+
+    # Ensure we know whether it exists in Radarr
+    existing = await radarr_find_by_tmdb(inst, tmdb_id)
+
+    if existing and existing.id and inst.regrab_mode == "search":
+        # Keep the movie (tags, profile, metadata); only swap the file
+        result = await regrab_movie_files(inst, [existing])
+        if result:
+            return result
+        logging.warning(f"File-only regrab failed for tmdbId {tmdb_id}; falling back to delete and re-add")
+
+    # Everything below adds the movie, which needs the discovered profile and root folder
+    if not await inst.ensure_discovered():
+        return False, "not_ready", None
+
+    if existing and existing.id:
+        # Delete whole movie (and files), then re-add with search
+        movie_id = existing.id
+        del_resp = await radarr_delete_movie(inst, movie_id, delete_files=True)
+        if not (del_resp and 200 <= del_resp.status_code < 400):
+            return False, "delete_failed", None
+
+        # Re-add and search
+        add_resp = await radarr_add_and_search(
+            inst,
+            tmdb_id=tmdb_id,
+            title=movie.title,
+            year=movie.year,
+            title_slug=existing.title_slug,
+            images=existing.images,
+        )
+        if add_resp and 200 <= add_resp.status_code < 400:
+            return True, "regrabbing", added_movie_watch(inst, add_resp)
+        return False, "error", None
+
+    # Not in Radarr — just add + search
+    add_resp = await radarr_add_and_search(
+        inst,
+        tmdb_id=tmdb_id,
+        title=movie.title,
+        year=movie.year,
+        title_slug=movie.title_slug,
+        images=movie.images,
+    )
+    if add_resp and 200 <= add_resp.status_code < 400:
+        return True, "requested", added_movie_watch(inst, add_resp)
+    return False, "request_failed", None
+
+class ConfirmButtonsMovie(TracedView):
     def __init__(self, interaction, media_info):
         super().__init__()
         self.interaction = interaction
@@ -262,53 +2061,19 @@ class ConfirmButtonsMovie(View):
         self.add_item(cancel_button)
 
     async def regrab_callback(self, interaction):
+        mark_stage(self.media_info, "movie", "confirm")
+        await acknowledge(interaction)  # the regrab below waits on Radarr/Sonarr; the click goes ahead either way
         # remove ephemeral UI
         await safe_delete_original(self.interaction)
 
         # public placeholder
         status_msg = await interaction.channel.send("🔎 Working on your movie re-grab…")
 
-        movie_title = self.media_info["title"]
-        movie_year = self.media_info.get("year")
-        tmdb_id = int(self.media_info["tmdbId"])
-
-        # Ensure we know whether it exists in Radarr
-        existing = radarr_find_by_tmdb(tmdb_id)
-
-        if existing and existing.get("id"):
-            # Delete whole movie (and files), then re-add with search
-            movie_id = int(existing["id"])
-            del_resp = radarr_delete_movie(movie_id, delete_files=True)
-            if not (del_resp and 200 <= del_resp.status_code < 400):
-                await status_msg.edit(content=f"❌ **{interaction.user.display_name}** — couldn’t delete **{movie_title} ({movie_year or 'N/A'})** from Radarr.")
-                return
-
-            # Re-add and search
-            add_resp = radarr_add_and_search(
-                tmdb_id=tmdb_id,
-                title=movie_title,
-                year=movie_year,
-                title_slug=existing.get("titleSlug", ""),
-                images=existing.get("images", []),
-            )
-            if add_resp and 200 <= add_resp.status_code < 400:
-                await status_msg.edit(content=f"🔎 **{interaction.user.display_name}** — re-grabbing **{movie_title} ({movie_year or 'N/A'})** (deleted & started search).")
-            else:
-                await status_msg.edit(content=f"❌ **{interaction.user.display_name}** — re-grab failed for **{movie_title} ({movie_year or 'N/A'})**.")
-            return
-
-        # Not in Radarr — just add + search
-        add_resp = radarr_add_and_search(
-            tmdb_id=tmdb_id,
-            title=movie_title,
-            year=movie_year,
-            title_slug=self.media_info.get("titleSlug", ""),
-            images=self.media_info.get("images", []),
-        )
-        if add_resp and 200 <= add_resp.status_code < 400:
-            await status_msg.edit(content=f"🔎 **{interaction.user.display_name}** — requested **{movie_title} ({movie_year or 'N/A'})** and started search.")
-        else:
-            await status_msg.edit(content=f"❌ **{interaction.user.display_name}** — request for **{movie_title} ({movie_year or 'N/A'})** failed. Try again later.")
+        inst, movie = self.media_info["instance"], self.media_info["movie"]
+        label = f"**{movie.title} ({movie.year or 'N/A'})**{inst.suffix}"
+        await run_regrab(inst.queue, [("movie", movie.tmdb_id)], lambda keys: regrab_movie_job(inst, movie),
+                         status_msg, interaction.user.display_name, label, MOVIE_MESSAGES)
+        mark_stage(self.media_info, "movie", "search_queued")
 
     async def cancel_callback(self, interaction):
         try:
@@ -316,58 +2081,101 @@ class ConfirmButtonsMovie(View):
         except Exception:
             pass
 
+def movie_confirmation(m, media_info):
+    # Fill media_info for confirm step
+    inst = item_instance(m)
+    media_info.update({"instance": inst, "movie": m})
+    overview = m.overview or "No overview available."
+    return (
+        f"Please confirm you want to **regrab**:\n"
+        f"**Title:** {m.title}\n"
+        f"**Year:** {m.year or 'N/A'}\n"
+        + (f"**Radarr:** {inst.name}\n" if inst.suffix else "")
+        + f"**Overview:** {overview}\n"
+    )
+
 class MovieSelector(Select):
-    def __init__(self, results, media_info):
+    def __init__(self, results, start, page_results, media_info):
         self.results = results
         self.media_info = media_info
         options = [
-            discord.SelectOption(label=m["title"], value=str(i), description=str(m.get("year", "")))
-            for i, m in enumerate(results)
+            discord.SelectOption(label=m.title[:100], value=str(i), description=f"{m.year or ''}{item_instance(m).suffix}")
+            for i, m in enumerate(page_results, start)
         ]
         super().__init__(placeholder="Please select a movie", options=options, min_values=1, max_values=1)
 
     async def callback(self, interaction: discord.Interaction):
         idx = int(self.values[0])
         m = self.results[idx]
-        # Fill media_info for confirm step
-        self.media_info.update({
-            "title": m.get("title", "Unknown Title"),
-            "year": m.get("year"),
-            "tmdbId": m.get("tmdbId"),
-            "titleSlug": m.get("titleSlug", ""),
-            "images": m.get("images", []),
-        })
-
-        overview = m.get("overview", "No overview available.")
-        confirmation_message = (
-            f"Please confirm you want to **regrab**:\n"
-            f"**Title:** {self.media_info['title']}\n"
-            f"**Year:** {self.media_info.get('year','N/A')}\n"
-            f"**Overview:** {overview}\n"
-        )
+        confirmation_message = movie_confirmation(m, self.media_info)
         await interaction.response.edit_message(content=confirmation_message, view=ConfirmButtonsMovie(interaction, self.media_info))
 
-class MovieSelectorView(View):
-    def __init__(self, results, media_info):
-        super().__init__(timeout=180)
-        self.add_item(MovieSelector(results, media_info))
+class MovieSelectorView(PagedView):
+    def make_select(self, start, page_items):
+        return MovieSelector(self.items, start, page_items, self.media_info)
 
 # ------------- EPISODE REGRAB FLOW -------------
 async def fetch_series_list(series_name):
-    resp = sonarr_series_lookup(series_name)
-    if resp and resp.status_code == 200:
-        return resp.json()[:10]
-    return []
+    async def lookup(inst):
+        async def fetch():
+            resp = await sonarr_series_lookup(inst, series_name)
+            if resp and resp.status_code == 200:
+                return resp.records
+            return None
+        return await inst.lookup_cache.get_or_fetch(normalize_term(series_name), fetch) or []
+    return await fan_out(sonarr_instances, lookup)
+
+async def fetch_seasons(series):
+    return [n for n in series.seasons or [] if n != 0]
+
+def store_episodes(inst, series_id, season_number, episodes):
+    inst.episode_cache.set((series_id, season_number), episodes)
+    if library_snapshot:
+        library_snapshot.save_episodes(inst.name, series_id, season_number, episodes)
+
+def prefetch_episodes(inst, series):
+    # While the season menu is up, load every season with one request so picking one is a cache hit
+    series_id = series.id
+    seasons = series.seasons or []
+    if seasons and all(inst.episode_cache.get((series_id, n)) is not None for n in seasons):
+        return
 
-async def fetch_seasons(selected_series_data):
-    seasons = selected_series_data.get("seasons", [])
-    return [s for s in seasons if s.get("seasonNumber") != 0]
+    async def fetch():
+        resp = await sonarr_fetch_episodes(inst, series_id)
+        if not (resp and resp.status_code == 200):
+            return None
+        by_season = {n: [] for n in seasons}
+        for ep in resp.records:
+            by_season.setdefault(ep.season_number, []).append(ep)
+        for season_number, episodes in by_season.items():
+            store_episodes(inst, series_id, season_number, episodes)
+        return None  # only the per-season entries are kept
+    inst.episode_cache.prefetch((series_id, None), fetch)
+
+async def fetch_episodes(inst, series_id, season_number):
+    key = (series_id, season_number)
+    if inst.episode_cache.get(key) is None:
+        await inst.episode_cache.join((series_id, None))  # a prefetch is already bringing it
+
+    async def fetch():
+        resp = await sonarr_fetch_episodes(inst, series_id, season_number)
+        if resp and resp.status_code == 200:
+            episodes = resp.records
+            if library_snapshot:
+                library_snapshot.save_episodes(inst.name, series_id, season_number, episodes)
+            return episodes
+        return None
+    episodes = await inst.episode_cache.get_or_fetch(key, fetch)
+    if episodes is None and library_snapshot:
+        # Sonarr unreachable: fall back to the last list we saw
+        episodes = await library_snapshot.episodes(inst.name, series_id, season_number)
+    return episodes or []
 
 def past_aired_episodes(episodes):
     out = []
     today = datetime.now().date()
     for ep in episodes:
-        air_date_str = ep.get("airDate")
+        air_date_str = ep.air_date
         if not air_date_str:
             continue
         try:
@@ -379,7 +2187,47 @@ def past_aired_episodes(episodes):
             pass
     return out
 
-class ConfirmButtonsSeries(View):
+def episodes_label(media_info, limit=5):
+    season = media_info["seasonNumber"]
+    suffix = media_info["instance"].suffix
+    title = media_info["series"].title
+    if media_info.get("wholeSeason"):
+        return f"{title} Season {season}{suffix}"
+    episodes = media_info["episodes"]
+    codes = ", ".join(f"S{season:02d}E{ep.episode_number:02d}" for ep in episodes[:limit])
+    if len(episodes) > limit:
+        codes += f" (+{len(episodes) - limit} more)"
+    return f"{title} {codes}{suffix}"
+
+EPISODE_MESSAGES = {
+    "delete_failed": "❌ **{user}** — couldn’t delete the existing file(s) for {label}.",
+    "regrabbing": "🔎 **{user}** — re-grabbing {label}.",
+    "search_started": SWEEP_MERGED_MESSAGE,
+    "error": "❌ **{user}** — re-grab failed for {label}.",
+    "unreachable": "⚠️ **{user}** — Sonarr isn’t responding, so {label} was left untouched. Try again in a bit.",
+}
+
+async def regrab_episodes_job(inst, episodes):
+    if inst.breaker.is_open():
+        return False, "unreachable", None
+    episode_file_ids = sorted({ep.episode_file_id for ep in episodes if ep.episode_file_id})
+
+    # If files exist, delete them first (one bulk call)
+    if episode_file_ids:
+        del_resp = await sonarr_delete_episodefiles(inst, episode_file_ids)
+        for season in {(ep.series_id, ep.season_number) for ep in episodes}:
+            inst.episode_cache.invalidate(season)  # cached file ids are stale now
+        if not (del_resp and 200 <= del_resp.status_code < 400):
+            return False, "delete_failed", None
+
+    # Kick off a single EpisodeSearch for every selected episode
+    episode_ids = [ep.id for ep in episodes]
+    search_resp = await sonarr_episode_search(inst, episode_ids)
+    if search_resp and 200 <= search_resp.status_code < 400:
+        return True, "regrabbing", command_watch(inst, search_resp, episode_ids)
+    return False, "error", None
+
+class ConfirmButtonsSeries(TracedView):
     def __init__(self, interaction, media_info):
         super().__init__()
         self.interaction = interaction
@@ -394,31 +2242,21 @@ class ConfirmButtonsSeries(View):
         self.add_item(cancel_button)
 
     async def regrab_callback(self, interaction):
+        mark_stage(self.media_info, "episode", "confirm")
+        await acknowledge(interaction)  # the regrab below waits on Radarr/Sonarr; the click goes ahead either way
         # remove ephemeral UI
         await safe_delete_original(self.interaction)
 
         # public placeholder
         status_msg = await interaction.channel.send("🔎 Working on your episode re-grab…")
 
-        episode_id = self.media_info["episodeId"]
-        episode_file_id = self.media_info.get("episodeFileId", 0)
-
-        # If a file exists, delete it first
-        if episode_file_id:
-            del_resp = sonarr_delete_episodefile(episode_file_id)
-            if not (del_resp and 200 <= del_resp.status_code < 400):
-                await status_msg.edit(content=f"❌ **{interaction.user.display_name}** — couldn’t delete the existing file for "
-                                              f"{self.media_info['series']} S{self.media_info['seasonNumber']:02d}E{self.media_info['episodeNumber']:02d}.")
-                return
-
-        # Kick off EpisodeSearch
-        search_resp = sonarr_episode_search(episode_id)
-        if search_resp and 200 <= search_resp.status_code < 400:
-            await status_msg.edit(content=f"🔎 **{interaction.user.display_name}** — re-grabbing "
-                                          f"{self.media_info['series']} S{self.media_info['seasonNumber']:02d}E{self.media_info['episodeNumber']:02d}.")
-        else:
-            await status_msg.edit(content=f"❌ **{interaction.user.display_name}** — re-grab failed for "
-                                          f"{self.media_info['series']} S{self.media_info['seasonNumber']:02d}E{self.media_info['episodeNumber']:02d}.")
+        inst = self.media_info["instance"]
+        episodes = {ep.id: ep for ep in self.media_info["episodes"]}
+        label = episodes_label(self.media_info)
+        await run_regrab(inst.queue, [("episode", i) for i in episodes],
+                         lambda keys: regrab_episodes_job(inst, [episodes[i] for _, i in keys]),
+                         status_msg, interaction.user.display_name, label, EPISODE_MESSAGES)
+        mark_stage(self.media_info, "episode", "search_queued")
 
     async def cancel_callback(self, interaction):
         try:
@@ -427,103 +2265,96 @@ class ConfirmButtonsSeries(View):
             pass
 
 class TVSeriesSelector(Select):
-    def __init__(self, series_results, media_info):
+    def __init__(self, series_results, start, page_results, media_info):
         self.series_results = series_results
         self.media_info = media_info
         options = [
-            discord.SelectOption(label=s["title"], value=str(i), description=str(s.get("year", "")))
-            for i, s in enumerate(series_results)
+            discord.SelectOption(label=s.title[:100], value=str(i), description=f"{s.year or ''}{item_instance(s).suffix}")
+            for i, s in enumerate(page_results, start)
         ]
         super().__init__(placeholder="Please select a TV series", options=options, min_values=1, max_values=1)
 
     async def callback(self, interaction: discord.Interaction):
         idx = int(self.values[0])
         selected = self.series_results[idx]
+        inst = item_instance(selected)
+        # Adding the series can wait on discovery and Sonarr for longer than Discord allows
+        if not await acknowledge(interaction):
+            return
 
-        # Ensure series exists in Sonarr; if not, add and then re-fetch to get its id
-        if "id" not in selected:
-            add_resp = sonarr_add_series(
-                title=selected["title"],
-                tvdb_id=selected["tvdbId"],
-                title_slug=selected.get("titleSlug", ""),
-                images=selected.get("images", []),
+        # Ensure series exists in Sonarr; if not, add it and keep the stored copy (with its id)
+        if selected.id is None:
+            selected = inst.index.get_by_external(selected.tvdb_id) or selected
+        if selected.id is None and not await inst.ensure_discovered():
+            await edit_deferred(interaction, "Still connecting to Sonarr. Please try again in a minute.")
+            return
+        if selected.id is None:
+            add_resp = await sonarr_add_series(
+                inst,
+                title=selected.title,
+                tvdb_id=selected.tvdb_id,
+                title_slug=selected.title_slug or "",
+                images=selected.images or [],
             )
             if not (add_resp and 200 <= add_resp.status_code < 400):
-                try:
-                    await interaction.response.edit_message(content="Failed to add series to Sonarr. Please try again.")
-                except discord.errors.NotFound:
-                    try:
-                        await interaction.followup.send("This session has expired. Please re-run the command.", ephemeral=True)
-                    except Exception:
-                        pass
+                await edit_deferred(interaction, "Failed to add series to Sonarr. Please try again.", self.view)
+                return
+            # Sonarr answers the add with the stored series; fall back to a lookup if it didn't
+            added = add_resp.json()
+            if isinstance(added, dict) and added.get("id"):
+                selected = SeriesRecord.from_json(inst.name, added)
+                inst.index.upsert(selected)
+            else:
+                selected = await sonarr_find_series_by_tvdb(inst, selected.tvdb_id) or selected
+            if selected.id is None:
+                await edit_deferred(interaction, "Failed to add series to Sonarr. Please try again.", self.view)
                 return
-            # replace with stored series having id
-            for s in sonarr_series_all():
-                if s.get("tvdbId") == selected["tvdbId"]:
-                    selected = s
-                    break
 
-        self.media_info["series"] = selected["title"]
-        self.media_info["seriesId"] = selected["id"]
+        self.media_info["instance"] = inst
+        self.media_info["series"] = selected
 
+        prefetch_episodes(inst, selected)
         seasons = await fetch_seasons(selected)
-        try:
-            await interaction.response.edit_message(content="Please select a season", view=SeasonSelectorView(seasons, self.media_info))
-        except discord.errors.NotFound:
-            try:
-                await interaction.followup.send("This session has expired. Please re-run the command.", ephemeral=True)
-            except Exception:
-                pass
+        await edit_deferred(interaction, "Please select a season", SeasonSelectorView(seasons, self.media_info))
 
 class SeasonSelector(Select):
-    def __init__(self, seasons_results, media_info):
+    def __init__(self, seasons_results, start, page_results, media_info):
         self.seasons_results = seasons_results
         self.media_info = media_info
         options = [
-            discord.SelectOption(label=f"Season {s['seasonNumber']}", value=str(i))
-            for i, s in enumerate(seasons_results)
+            discord.SelectOption(label=f"Season {n}", value=str(i))
+            for i, n in enumerate(page_results, start)
         ]
         super().__init__(placeholder="Please select a season", options=options, min_values=1, max_values=1)
 
     async def callback(self, interaction: discord.Interaction):
         idx = int(self.values[0])
-        season_number = self.seasons_results[idx]["seasonNumber"]
+        season_number = self.seasons_results[idx]
         self.media_info["seasonNumber"] = season_number
+        # A cold episode list can take several retried Sonarr calls
+        if not await acknowledge(interaction):
+            return
 
-        resp = sonarr_fetch_episodes(self.media_info["seriesId"], season_number)
-        episodes = resp.json() if resp and resp.status_code == 200 else []
+        episodes = await fetch_episodes(self.media_info["instance"], self.media_info["series"].id, season_number)
         episodes = past_aired_episodes(episodes)
 
         if not episodes:
-            try:
-                await interaction.response.edit_message(
-                    content="No aired episodes available yet for this season. Try again later.",
-                    view=None,
-                )
-            except discord.errors.NotFound:
-                try:
-                    await interaction.followup.send("This session has expired. Please re-run the command.", ephemeral=True)
-                except Exception:
-                    pass
+            await edit_deferred(interaction, "No aired episodes available yet for this season. Try again later.")
             return
 
-        try:
-            await interaction.response.edit_message(content="Please select an episode", view=EpisodeSelectorView(episodes, self.media_info))
-        except discord.errors.NotFound:
-            try:
-                await interaction.followup.send("This session has expired. Please re-run the command.", ephemeral=True)
-            except Exception:
-                pass
+        await edit_deferred(interaction, "Please select an episode", EpisodeSelectorView(episodes, self.media_info))
+
+WHOLE_SEASON = "all"
 
 class EpisodeSelector(Select):
-    def __init__(self, episodes_results, media_info):
+    def __init__(self, episodes_results, start, page_results, media_info):
         self.episodes_results = episodes_results
         self.media_info = media_info
         today = datetime.now().date()
         options = []
-        for i, ep in enumerate(episodes_results):
-            ep_no = ep.get("episodeNumber")
-            air = ep.get("airDate")
+        for i, ep in enumerate(page_results, start):
+            ep_no = ep.episode_number
+            air = ep.air_date
             desc = None
             if air:
                 try:
@@ -533,67 +2364,962 @@ class EpisodeSelector(Select):
                 except ValueError:
                     pass
             options.append(discord.SelectOption(label=f"Episode {ep_no}", value=str(i), description=desc))
-        super().__init__(placeholder="Please select an episode", options=options, min_values=1, max_values=1)
+        if len(episodes_results) > 1:
+            options.insert(0, discord.SelectOption(label="Whole season", value=WHOLE_SEASON,
+                                                   description=f"All {len(episodes_results)} aired episodes"))
+        super().__init__(placeholder="Please select episode(s)", options=options, min_values=1, max_values=len(options))
 
     async def callback(self, interaction: discord.Interaction):
-        idx = int(self.values[0])
-        ep = self.episodes_results[idx]
-        self.media_info.update({
-            "episodeId": ep["id"],
-            "episodeNumber": ep["episodeNumber"],
-            "title": ep.get("title", ""),
-            "overview": ep.get("overview", ""),
-            "episodeFileId": ep.get("episodeFileId", 0),
-        })
-        content = (
-            f"Please confirm you want to **regrab**:\n"
-            f"**Series:** {self.media_info['series']}\n"
-            f"**Season:** {self.media_info['seasonNumber']}\n"
-            f"**Episode:** {self.media_info['episodeNumber']}\n"
-            f"**Title:** {self.media_info.get('title', '')}\n"
-            f"**Overview:** {self.media_info.get('overview', 'No overview')}\n"
-        )
+        whole_season = WHOLE_SEASON in self.values
+        if whole_season:
+            picked = list(self.episodes_results)
+        else:
+            picked = [self.episodes_results[int(v)] for v in sorted(self.values, key=int)]
+        self.media_info.update({"wholeSeason": whole_season, "episodes": picked})
+        if len(picked) == 1:
+            ep = picked[0]
+            content = (
+                f"Please confirm you want to **regrab**:\n"
+                f"**Series:** {self.media_info['series'].title}\n"
+                f"**Season:** {self.media_info['seasonNumber']}\n"
+                f"**Episode:** {ep.episode_number}\n"
+                f"**Title:** {ep.title or ''}\n"
+                f"**Overview:** {ep.overview or 'No overview'}\n"
+            )
+        else:
+            numbers = ", ".join(str(ep.episode_number) for ep in picked)
+            content = (
+                f"Please confirm you want to **regrab**:\n"
+                f"**Series:** {self.media_info['series'].title}\n"
+                f"**Season:** {self.media_info['seasonNumber']}\n"
+                f"**Episodes:** {'all aired' if whole_season else numbers} ({len(picked)})\n"
+            )
         await interaction.response.edit_message(content=content, view=ConfirmButtonsSeries(interaction, self.media_info))
 
-class SeriesSelectorView(View):
-    def __init__(self, series_results, media_info):
-        super().__init__(timeout=180)
-        self.add_item(TVSeriesSelector(series_results, media_info))
+class SeriesSelectorView(PagedView):
+    def make_select(self, start, page_items):
+        return TVSeriesSelector(self.items, start, page_items, self.media_info)
 
-class SeasonSelectorView(View):
-    def __init__(self, seasons_results, media_info):
-        super().__init__(timeout=180)
-        self.add_item(SeasonSelector(seasons_results, media_info))
+class SeasonSelectorView(PagedView):
+    def make_select(self, start, page_items):
+        return SeasonSelector(self.items, start, page_items, self.media_info)
 
-class EpisodeSelectorView(View):
-    def __init__(self, episodes_results, media_info):
-        super().__init__(timeout=180)
-        self.add_item(EpisodeSelector(episodes_results, media_info))
+class EpisodeSelectorView(PagedView):
+    page_size = MAX_SELECT_OPTIONS - 1  # one option is "Whole season"
+
+    def make_select(self, start, page_items):
+        return EpisodeSelector(self.items, start, page_items, self.media_info)
+
+    def render(self):
+        super().render()
+        if self.pages > 1:
+            self.add_button("Jump to episode…", self.jump)
+
+    async def jump(self, interaction):
+        await interaction.response.send_modal(JumpToEpisode(self))
+
+class JumpToEpisode(discord.ui.Modal, title="Jump to episode"):
+    number = discord.ui.TextInput(label="Episode number", max_length=6)
+
+    def __init__(self, picker):
+        super().__init__()
+        self.picker = picker
+
+    async def on_submit(self, interaction: discord.Interaction):
+        wanted = self.number.value.strip()
+        for i, ep in enumerate(self.picker.items):
+            if str(ep.episode_number) == wanted:
+                await self.picker.show_page(interaction, i // self.picker.page_size)
+                return
+        await interaction.response.send_message(f"No aired episode {wanted} in this season.", ephemeral=True)
+
+# ------------- Autocomplete -------------
+# Picking a suggestion sends e.g. "tmdb:603@radarr"; free text still goes through the lookup.
+def choice_label(item):
+    label = f"{item.title or 'Unknown'} ({item.year or 'N/A'}){item_instance(item).suffix}"
+    return label if len(label) <= 100 else label[:99] + "…"
+
+def parse_choice(value, prefix, instances):
+    # -> (instance, external id), or (None, None) for free text
+    kind, _, ident = (value or "").partition(":")
+    ident, _, name = ident.partition("@")
+    if kind != prefix or not ident.isdigit():
+        return None, None
+    inst = arr_instances.get(name) if name else instances[0]
+    if inst not in instances:
+        return None, None
+    return inst, int(ident)
+
+def known_item(value, prefix, instances):
+    inst, external_id = parse_choice(value, prefix, instances)
+    return inst.index.get_by_external(external_id) if inst else None
+
+def search_indexes(instances, current):
+    return interleave(instances, [inst.index.search(current) for inst in instances], limit=AUTOCOMPLETE_LIMIT)
+
+async def movie_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=choice_label(m), value=f"tmdb:{m.tmdb_id}@{m.instance}")
+            for m in search_indexes(radarr_instances, current) if m.tmdb_id]
+
+async def series_autocomplete(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=choice_label(s), value=f"tvdb:{s.tvdb_id}@{s.instance}")
+            for s in search_indexes(sonarr_instances, current) if s.tvdb_id]
 
 # ------------- Slash Commands (with “🔎 Searching…” window) -------------
-@bot.tree.command(name=regrab_movie_command_name, description="Delete and redownload the selected movie")
 @app_commands.describe(movie="What movie should we regrab?")
+@app_commands.autocomplete(movie=movie_autocomplete)
 async def regrab_movie(ctx, *, movie: str):
     await ctx.response.defer(ephemeral=True)
+    media_info = {}
+    start_trace("movie", media_info, ctx.user.id)
+    mark_stage(media_info, "movie", "defer")
+    known = known_item(movie, "tmdb", radarr_instances)
+    if known:
+        await ctx.followup.send(movie_confirmation(known, media_info), view=ConfirmButtonsMovie(ctx, media_info), ephemeral=True)
+        mark_stage(media_info, "movie", "results_shown")
+        return
     searching = await ctx.followup.send("🔎 Searching for movies…", ephemeral=True)
     results = await fetch_movie_list(movie)
     if not results:
-        await searching.edit(content=f"No movie matching the title: {movie}")
+        down = unreachable(radarr_instances)
+        await searching.edit(content=f"⚠️ Can't reach {', '.join(down)} right now. Try again in a bit." if down
+                             else f"No movie matching the title: {movie}")
         return
-    media_info = {}
     await searching.edit(content="Select a movie to regrab:", view=MovieSelectorView(results, media_info))
+    mark_stage(media_info, "movie", "results_shown")
 
-@bot.tree.command(name=regrab_episode_command_name, description="Delete and redownload the selected episode")
 @app_commands.describe(series="What TV series should we regrab from?")
+@app_commands.autocomplete(series=series_autocomplete)
 async def regrab_episode(ctx, *, series: str):
     await ctx.response.defer(ephemeral=True)
+    media_info = {}
+    start_trace("episode", media_info, ctx.user.id)
+    mark_stage(media_info, "episode", "defer")
+    known = known_item(series, "tvdb", sonarr_instances)
+    if known:
+        media_info.update({"instance": item_instance(known), "series": known})
+        prefetch_episodes(media_info["instance"], known)
+        seasons = await fetch_seasons(known)
+        await ctx.followup.send("Please select a season", view=SeasonSelectorView(seasons, media_info), ephemeral=True)
+        mark_stage(media_info, "episode", "results_shown")
+        return
     searching = await ctx.followup.send("🔎 Searching for shows…", ephemeral=True)
     series_results = await fetch_series_list(series)
     if not series_results:
-        await searching.edit(content=f"No TV series matching the title: {series}")
+        down = unreachable(sonarr_instances)
+        await searching.edit(content=f"⚠️ Can't reach {', '.join(down)} right now. Try again in a bit." if down
+                             else f"No TV series matching the title: {series}")
         return
-    media_info = {}
     await searching.edit(content="Select a TV series to regrab:", view=SeriesSelectorView(series_results, media_info))
+    mark_stage(media_info, "episode", "results_shown")
+
+def command_names():
+    return regrab_movie_command_name, regrab_episode_command_name, regrab_sweep_command_name
+
+def register_commands(previous=()):
+    # Command names come from the config, so they are attached once it is loaded (and again after a rename)
+    for name in previous:
+        bot.tree.remove_command(name)
+    bot.tree.add_command(app_commands.command(name=regrab_movie_command_name,
+                                              description="Delete and redownload the selected movie")(regrab_movie))
+    bot.tree.add_command(app_commands.command(name=regrab_episode_command_name,
+                                              description="Delete and redownload the selected episode")(regrab_episode))
+    # Server admins only by default; can be opened up per role in the server's integration settings
+    bot.tree.add_command(app_commands.default_permissions(manage_guild=True)(app_commands.command(
+        name=regrab_sweep_command_name, description="Find missing, below-cutoff and failed items and regrab them in bulk")(
+        regrab_sweep_command)))
+
+# ------------- Batch regrab (headless) -------------
+# `python regrabarr.py batch FILE` regrabs a list of items without Discord, e.g. after losing a disk.
+# Each CSV row (with a header) or JSON line names one of:
+#   tmdb_id or radarr_id                       a movie
+#   tvdb_id or series_id, season[, episode]    one episode, or every aired episode of the season
+#   episode_id                                 one Sonarr episode
+# plus an optional `instance`. Progress is checkpointed as each regrab job finishes.
+BATCH_FIELDS = {"tmdbid": "tmdb_id", "radarrid": "radarr_id", "movieid": "radarr_id", "tvdbid": "tvdb_id",
+                "seriesid": "series_id", "sonarrid": "series_id", "season": "season", "seasonnumber": "season",
+                "episode": "episode", "episodenumber": "episode", "episodeid": "episode_id", "instance": "instance"}
+BATCH_OK = ("searching", "monitored", "regrabbing", "requested", "search_started", "dry_run")
+DEFAULT_BATCH_SIZE = 25  # items per delete/search command
+DEFAULT_BATCH_WINDOW = 200  # rows resolved and queued together
+BATCH_RESOLVE_CONCURRENCY = 8
+BATCH_REPORT_FAILURES = 20
+
+class BatchSkip(Exception):
+    # A row that can't be regrabbed; the message is its status in the report
+    pass
+
+def read_batch_rows(path):
+    # Streams (row number, raw row) so large files never sit in memory; unparseable lines come back as text
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            for n, raw in enumerate(csv.DictReader(f), 1):
+                yield n, raw
+            return
+        n = 0
+        for line in f:
+            if not line.strip():
+                continue
+            n += 1
+            try:
+                yield n, json.loads(line)
+            except ValueError:
+                yield n, line.strip()
+
+def batch_row(raw):
+    # Accepts snake_case and the *arr camelCase names (tmdbId, seriesId, …)
+    row = {}
+    for key, value in raw.items():
+        field = BATCH_FIELDS.get(str(key).replace("_", "").replace(" ", "").lower())
+        if field is None or value is None or value == "":
+            continue
+        if field != "instance":
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise BatchSkip("invalid")
+        row[field] = value
+    return row
+
+def batch_instances(row, instances):
+    name = row.get("instance")
+    if name is None:
+        if not instances:
+            raise BatchSkip("unknown_instance")
+        return instances
+    inst = arr_instances.get(name)
+    if inst not in instances:
+        raise BatchSkip("unknown_instance")
+    return [inst]
+
+def batch_missing(inst):
+    return BatchSkip("unreachable" if inst.breaker.is_open() else "not_found")
+
+async def resolve_batch_row(row):
+    # -> (instance, MovieRecord) or (instance, [EpisodeRecord])
+    if "radarr_id" in row:
+        inst = batch_instances(row, radarr_instances)[0]
+        movie = inst.index.get_by_id(row["radarr_id"])
+        if not movie:
+            raise batch_missing(inst)
+        return inst, movie
+    if "tmdb_id" in row:
+        instances = batch_instances(row, radarr_instances)
+        for inst in instances:
+            movie = inst.index.get_by_external(row["tmdb_id"])
+            if movie:
+                return inst, movie
+        # Not in Radarr yet: it gets added, just like picking a lookup result in Discord
+        inst = instances[0]
+        resp = await radarr_lookup(inst, f"tmdb:{row['tmdb_id']}")
+        for movie in (resp.records or []) if resp else []:
+            if movie.tmdb_id == row["tmdb_id"]:
+                return inst, movie
+        raise batch_missing(inst)
+    if "episode_id" in row:
+        inst = batch_instances(row, sonarr_instances)[0]
+        episode = await sonarr_get_episode(inst, row["episode_id"])
+        if not episode:
+            raise batch_missing(inst)
+        return inst, [episode]
+    if "series_id" in row or "tvdb_id" in row:
+        if "season" not in row:
+            raise BatchSkip("invalid")
+        instances = batch_instances(row, sonarr_instances)
+        if "series_id" in row:
+            inst, series_id = instances[0], row["series_id"]
+        else:
+            for inst in instances:
+                series = await sonarr_find_series_by_tvdb(inst, row["tvdb_id"])
+                if series:
+                    break
+            else:
+                raise batch_missing(instances[0])
+            series_id = series.id
+        episodes = await fetch_episodes(inst, series_id, row["season"])
+        if "episode" in row:
+            episodes = [ep for ep in episodes if ep.episode_number == row["episode"]]
+        else:
+            episodes = past_aired_episodes(episodes)
+        if not episodes:
+            raise batch_missing(inst)
+        return inst, episodes
+    raise BatchSkip("invalid")
+
+def chunked(items, size):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), max(1, size))]
+
+class BatchRun:
+    def __init__(self, args):
+        self.args = args
+        self.path = os.path.abspath(args.file)
+        self.checkpoint_path = args.checkpoint or f"{args.file}.checkpoint.json"
+        self.row = 0  # last row that is done, along with every row before it
+        self.done = set()  # rows after self.row that are done too
+        self.counts = {}
+        self.failures = []
+        self.outcomes = {}  # (instance, key) -> status, per window
+        self.cooling = set()
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logging.warning(f"Ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return
+        if saved.get("input") != self.path:
+            logging.warning(f"Checkpoint {self.checkpoint_path} belongs to {saved.get('input')}; starting over")
+            return
+        self.row, self.counts, self.failures = saved["row"], saved["counts"], saved["failures"]
+        self.done = set(saved.get("done", []))
+        logging.info(f"Resuming {self.path} after row {self.row}")
+
+    def save_checkpoint(self):
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"input": self.path, "row": self.row, "done": sorted(self.done), "counts": self.counts,
+                       "failures": self.failures}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def record(self, n, raw, status):
+        self.done.add(n)
+        self.counts[status] = self.counts.get(status, 0) + 1
+        if status not in BATCH_OK:
+            self.failures.append({"row": n, "status": status, "item": raw})
+
+    def job(self, inst, run):
+        # Keeps each key's status for the report; a job may already have set some itself
+        async def wrapped(keys):
+            result = await run(keys)
+            for key in keys:
+                self.outcomes.setdefault((inst.name, key), result[1])
+            return result
+        return wrapped
+
+    async def movies_job(self, inst, movies):
+        if inst.breaker.is_open():
+            return False, "unreachable", None
+        result = await regrab_movie_files(inst, movies)
+        if result:
+            return result
+        # Bulk path failed: each movie takes the regular one, which may delete and re-add it
+        results = []
+        for movie in movies:
+            results.append(await regrab_movie_job(inst, movie))
+            self.outcomes[(inst.name, ("movie", movie.tmdb_id))] = results[-1][1]
+        return next((r for r in results if not r[0]), results[0])
+
+    def submit(self, inst, keys, run):
+        ticket = inst.queue.submit(keys, self.job(inst, run))
+        self.cooling.update((inst.name, key) for key in ticket.cooling)
+        return ticket
+
+    async def run_window(self, rows):
+        semaphore = asyncio.Semaphore(BATCH_RESOLVE_CONCURRENCY)
+
+        async def resolve(raw):
+            async with semaphore:
+                try:
+                    if not isinstance(raw, dict):
+                        raise BatchSkip("invalid")
+                    return await resolve_batch_row(batch_row(raw))
+                except BatchSkip as e:
+                    return str(e)
+        resolved = await asyncio.gather(*(resolve(raw) for _, raw in rows))
+
+        # Group per instance: movies Radarr has and episodes go out in bulk, the rest one by one
+        groups = {}
+        row_keys = []
+        for (n, raw), result in zip(rows, resolved):
+            if isinstance(result, str) or self.args.dry_run:
+                self.record(n, raw, result if isinstance(result, str) else "dry_run")
+                continue
+            inst, target = result
+            bulk, single, episodes = groups.setdefault(inst.name, ({}, {}, {}))
+            if isinstance(target, list):
+                keys = [("episode", ep.id) for ep in target]
+                episodes.update(zip(keys, target))
+            else:
+                keys = [("movie", target.tmdb_id)]
+                searchable = target.id and inst.regrab_mode == "search"
+                (bulk if searchable else single)[keys[0]] = target
+            row_keys.append((n, raw, inst, keys))
+
+        # A row is recorded, and the checkpoint saved, as soon as the last job it waits on finishes
+        waiting = {}
+        for entry in row_keys:
+            for key in entry[3]:
+                waiting.setdefault((entry[2].name, key), []).append(entry)
+        unfinished = {entry[0]: len(entry[3]) for entry in row_keys}
+
+        async def settle(ticket, inst, keys):
+            await ticket.wait()
+            for key in keys:
+                for entry in waiting.pop((inst.name, key), []):
+                    unfinished[entry[0]] -= 1
+                    if not unfinished[entry[0]]:
+                        self.finish_row(*entry)
+            self.save_checkpoint()
+
+        self.outcomes, self.cooling = {}, set()
+        jobs = []
+        for name, (bulk, single, episodes) in groups.items():
+            inst = arr_instances[name]
+            for chunk in chunked(bulk, self.args.batch_size):
+                jobs.append((self.submit(inst, chunk, lambda keys, inst=inst, items=bulk:
+                                         self.movies_job(inst, [items[k] for k in keys])), inst, chunk))
+            for key, movie in single.items():
+                jobs.append((self.submit(inst, [key], lambda keys, inst=inst, movie=movie:
+                                         regrab_movie_job(inst, movie)), inst, [key]))
+            for chunk in chunked(episodes, self.args.batch_size):
+                jobs.append((self.submit(inst, chunk, lambda keys, inst=inst, items=episodes:
+                                         regrab_episodes_job(inst, [items[k] for k in keys])), inst, chunk))
+        await asyncio.gather(*(settle(*job) for job in jobs))
+
+        self.row = rows[-1][0]
+        self.done = {n for n in self.done if n > self.row}
+        self.failures.sort(key=lambda failure: failure["row"])
+        if not self.args.dry_run:
+            self.save_checkpoint()
+        done = sum(self.counts.values())
+        logging.info(f"Batch: {done} row(s) done, {len(self.failures)} failed")
+
+    def finish_row(self, n, raw, inst, keys):
+        statuses = []
+        for key in keys:
+            status = self.outcomes.get((inst.name, key))
+            if status is None:
+                status = "recently_regrabbed" if (inst.name, key) in self.cooling else "error"
+            statuses.append(status)
+        self.record(n, raw, next((s for s in statuses if s not in BATCH_OK), statuses[0]))
+
+    def summary(self, elapsed):
+        lines = [f"Batch regrab of {self.path}: {sum(self.counts.values())} row(s) in {elapsed:.1f}s"]
+        lines += [f"  {status:<20}{count:>7}" for status, count in sorted(self.counts.items())]
+        for failure in self.failures[:BATCH_REPORT_FAILURES]:
+            lines.append(f"  row {failure['row']}: {failure['status']} {json.dumps(failure['item'])}")
+        if len(self.failures) > BATCH_REPORT_FAILURES:
+            lines.append(f"  … and {len(self.failures) - BATCH_REPORT_FAILURES} more")
+        return "\n".join(lines)
+
+async def run_batch(args):
+    start_trace("batch")
+    run = BatchRun(args)
+    if not args.restart:
+        run.load_checkpoint()
+    start = time.monotonic()
+    for inst in arr_instances.values():
+        if args.concurrency:
+            inst.queue.concurrency = args.concurrency
+        inst.queue.start()
+    try:
+        # Resolve rows against a fresh copy of each library
+        await asyncio.gather(*(inst.refresh_index() for inst in arr_instances.values()))
+        window = []
+        for n, raw in read_batch_rows(args.file):
+            if n <= run.row or n in run.done:
+                continue
+            window.append((n, raw))
+            if len(window) >= args.window:
+                await run.run_window(window)
+                window = []
+        if window:
+            await run.run_window(window)
+    finally:
+        for inst in arr_instances.values():
+            await inst.queue.stop()
+        await close_http_sessions()
+        if library_snapshot:
+            library_snapshot.close()
+    elapsed = time.monotonic() - start
+    print(run.summary(elapsed))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"input": run.path, "elapsed": round(elapsed, 1), "counts": run.counts,
+                       "failures": run.failures}, f, indent=2)
+    return 1 if run.failures else 0
+
+def batch_arguments(argv):
+    parser = argparse.ArgumentParser(prog="regrabarr.py batch",
+                                     description="Regrab the movies and episodes listed in a CSV or JSON lines file")
+    parser.add_argument("file")
+    parser.add_argument("--checkpoint", help="progress file (default: FILE.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--report", help="also write the summary as JSON to this file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="items per delete/search command")
+    parser.add_argument("--window", type=int, default=DEFAULT_BATCH_WINDOW, help="rows resolved and queued together")
+    parser.add_argument("--concurrency", type=int, help="regrab workers per instance (default: regrab_concurrency)")
+    parser.add_argument("--dry-run", action="store_true", help="resolve every row and report, but change nothing")
+    return parser.parse_args(argv)
+
+# ------------- Library sweep -------------
+# Finds monitored items that are missing, below their quality cutoff or stuck in the download queue
+# with a failed download/import, grouped per season (episodes) or per instance (movies). Regrabbing a
+# sweep only starts searches, in batched MoviesSearch/EpisodeSearch commands; nothing is deleted.
+SWEEP_REASONS = ("missing", "cutoff", "failed")
+SWEEP_REASON_LABELS = {"missing": "missing", "cutoff": "below cutoff", "failed": "failed download/import"}
+SWEEP_PAGE_SIZE = 250
+SWEEP_FAILED_STATES = ("failed", "failedPending", "importBlocked", "importFailed")
+
+class SweepError(Exception):
+    pass
+
+async def arr_wanted(inst, kind, project):
+    # Pages through wanted/missing or wanted/cutoff one page at a time
+    page = 1
+    while True:
+        resp = await perform_request(inst, "GET", f"{inst.base_url}/wanted/{kind}", headers={"X-Api-Key": inst.api_key},
+                                     params={"page": page, "pageSize": SWEEP_PAGE_SIZE, "monitored": "true",
+                                             "sortKey": "id", "sortDirection": "ascending"})
+        if not (resp and resp.status_code == 200):
+            raise SweepError(f"wanted/{kind} page {page} failed")
+        body = resp.json() or {}
+        records = body.get("records") or []
+        for data in records:
+            yield project(data)
+        if not records or page * SWEEP_PAGE_SIZE >= (body.get("totalRecords") or 0):
+            return
+        page += 1
+
+async def arr_failed_downloads(inst):
+    resp = await inst.fetch_queue()
+    if not (resp and resp.status_code == 200):
+        raise SweepError("queue failed")
+    for entry in resp.json() or []:
+        if entry.get("trackedDownloadState") in SWEEP_FAILED_STATES or entry.get("trackedDownloadStatus") == "error":
+            if inst.app == "radarr":
+                movie = inst.index.get_by_id(entry.get("movieId"))
+                if movie:
+                    yield movie
+            elif entry.get("episodeId"):
+                episode = await sonarr_get_episode(inst, entry["episodeId"])
+                if episode:
+                    yield episode
+
+class SweepGroup:
+    def __init__(self, inst, series_id=None, season=None):
+        self.inst = inst
+        self.series_id = series_id
+        self.season = season
+        self.items = {}
+        self.reasons = {}
+
+    def add(self, item, reason):
+        self.items.setdefault(item.id, item)
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def label(self):
+        if self.series_id is None:
+            return f"Movies{self.inst.suffix}"
+        series = self.inst.index.get_by_id(self.series_id)
+        title = series.title if series else f"Series {self.series_id}"
+        return f"{title} S{self.season:02d}{self.inst.suffix}"
+
+    def summary(self):
+        return ", ".join(f"{self.reasons[r]} {SWEEP_REASON_LABELS[r]}" for r in SWEEP_REASONS if r in self.reasons)
+
+class Sweep:
+    def __init__(self):
+        self.groups = {}
+        self.errors = []
+
+    def add(self, inst, item, reason):
+        if item.id is None:
+            return
+        key = (inst.name, None, None) if inst.app == "radarr" else (inst.name, item.series_id, item.season_number)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = SweepGroup(inst, key[1], key[2])
+        group.add(item, reason)
+
+    def sorted_groups(self):
+        return sorted(self.groups.values(), key=lambda g: (g.series_id is not None, g.label().lower()))
+
+    def totals(self):
+        movies = sum(len(g.items) for g in self.groups.values() if g.series_id is None)
+        return movies, sum(len(g.items) for g in self.groups.values()) - movies
+
+async def sweep_library(instances, reasons=SWEEP_REASONS):
+    sweep = Sweep()
+
+    async def scan(inst, reason):
+        project = movie_records(inst) if inst.app == "radarr" else EpisodeRecord.from_json
+        source = arr_failed_downloads(inst) if reason == "failed" else arr_wanted(inst, reason, project)
+        try:
+            async for item in source:
+                sweep.add(inst, item, reason)
+        except SweepError as e:
+            logging.warning(f"Sweep of {inst.name} incomplete: {e}")
+            sweep.errors.append(f"{inst.name} ({reason})")
+    await asyncio.gather(*(scan(inst, reason) for inst in instances for reason in reasons))
+    return sweep
+
+async def sweep_search_job(inst, items):
+    if inst.breaker.is_open():
+        return False, "unreachable", None
+    ids = [item.id for item in items]
+    resp = await (radarr_movies_search(inst, ids) if inst.app == "radarr" else sonarr_episode_search(inst, ids))
+    if resp and 200 <= resp.status_code < 400:
+        return True, "search_started", command_watch(inst, resp, ids)
+    return False, "error", None
+
+def sweep_key(inst, item):
+    return ("movie", item.tmdb_id) if inst.app == "radarr" else ("episode", item.id)
+
+async def regrab_sweep(groups, batch_size=DEFAULT_BATCH_SIZE):
+    # -> ({status: item count}, watches); one search command per chunk of items on each instance
+    by_instance = {}
+    for group in groups:
+        by_instance.setdefault(group.inst.name, {}).update(
+            (sweep_key(group.inst, item), item) for item in group.items.values())
+    tickets = []
+    for name, items in by_instance.items():
+        inst = arr_instances[name]
+        for chunk in chunked(items, batch_size):
+            tickets.append(inst.queue.submit(chunk, lambda keys, inst=inst, items=items:
+                                             sweep_search_job(inst, [items[k] for k in keys])))
+    counts, watches = {}, []
+    for ticket in tickets:
+        if ticket.cooling:
+            counts["recently_regrabbed"] = counts.get("recently_regrabbed", 0) + len(ticket.cooling)
+        if not ticket.futures:
+            continue
+        results = await ticket.wait()
+        status = next((st for ok, st, _ in results if not ok), results[0][1])
+        counts[status] = counts.get(status, 0) + len(ticket.fresh) + len(ticket.merged)
+        watches += [watch for ok, _, watch in results if ok and watch]
+    return counts, watches
+
+def sweep_outcome(counts):
+    return ", ".join(f"{count} {status.replace('_', ' ')}" for status, count in sorted(counts.items()))
+
+def sweep_content(sweep, groups, picked):
+    movies, episodes = sweep.totals()
+    lines = [f"Found {movies} movie(s) and {episodes} episode(s) in {len(groups)} group(s) to regrab."]
+    if sweep.errors:
+        lines.append(f"⚠️ Incomplete, couldn't read: {', '.join(sweep.errors)}")
+    lines.append(f"{len(picked)} group(s) selected. Regrabbing only starts searches; no files are deleted.")
+    return "\n".join(lines)
+
+class SweepSelector(Select):
+    def __init__(self, groups, start, page_groups, media_info):
+        self.groups = groups
+        self.media_info = media_info
+        picked = media_info["picked"]
+        options = [
+            discord.SelectOption(label=g.label()[:100], value=str(i), description=g.summary()[:100], default=i in picked)
+            for i, g in enumerate(page_groups, start)
+        ]
+        super().__init__(placeholder="Pick what to regrab", options=options, min_values=0, max_values=len(options))
+
+    async def callback(self, interaction: discord.Interaction):
+        picked = self.media_info["picked"]
+        picked.difference_update(int(o.value) for o in self.options)
+        picked.update(int(v) for v in self.values)
+        try:
+            await interaction.response.edit_message(
+                content=sweep_content(self.media_info["sweep"], self.groups, picked), view=self.view)
+        except discord.errors.NotFound:
+            pass
+
+class SweepView(PagedView):
+    def make_select(self, start, page_items):
+        return SweepSelector(self.items, start, page_items, self.media_info)
+
+    def render(self):
+        super().render()
+        for label, callback in (("Regrab selected", self.regrab_selected), (f"Regrab all ({len(self.items)})", self.regrab_all)):
+            button = Button(style=discord.ButtonStyle.primary, label=label, row=2)
+            button.callback = callback
+            self.add_item(button)
+
+    async def regrab_selected(self, interaction):
+        picked = sorted(self.media_info["picked"])
+        if not picked:
+            await interaction.response.send_message("Pick at least one group first.", ephemeral=True)
+            return
+        await self.regrab(interaction, [self.items[i] for i in picked])
+
+    async def regrab_all(self, interaction):
+        await self.regrab(interaction, self.items)
+
+    async def regrab(self, interaction, groups):
+        self.stop()
+        await acknowledge(interaction)  # the searches below can take a while
+        await safe_delete_original(self.media_info["interaction"])
+        movies = sum(len(g.items) for g in groups if g.series_id is None)
+        episodes = sum(len(g.items) for g in groups) - movies
+        label = f"{movies} movie(s) and {episodes} episode(s)"
+        user = interaction.user.display_name
+        status_msg = await interaction.channel.send(f"🔎 **{user}** — sweep: searching for {label}…")
+        counts, watches = await regrab_sweep(groups)
+        await status_msg.edit(content=f"🔎 **{user}** — sweep of {label}: {sweep_outcome(counts)}.")
+        for watch in watches:
+            command_poller.track(watch, status_msg, user, label)
+
+@app_commands.describe(scope="What to look for", app="Which library to sweep")
+@app_commands.choices(
+    scope=[app_commands.Choice(name="Everything", value="all")]
+          + [app_commands.Choice(name=SWEEP_REASON_LABELS[r].capitalize(), value=r) for r in SWEEP_REASONS],
+    app=[app_commands.Choice(name=n, value=v) for n, v in (("Radarr and Sonarr", "all"), ("Radarr", "radarr"), ("Sonarr", "sonarr"))],
+)
+async def regrab_sweep_command(ctx, scope: str = "all", app: str = "all"):
+    await ctx.response.defer(ephemeral=True)
+    media_info = {"picked": set(), "interaction": ctx}
+    start_trace("sweep", media_info, ctx.user.id)
+    instances = sweep_instances(app)
+    searching = await ctx.followup.send("🔎 Sweeping the library…", ephemeral=True)
+    sweep = await sweep_library(instances, SWEEP_REASONS if scope == "all" else (scope,))
+    groups = sweep.sorted_groups()
+    if not groups:
+        await searching.edit(content="⚠️ Couldn't read " + ", ".join(sweep.errors) if sweep.errors
+                             else "Nothing missing, below cutoff or failed. 🎉")
+        return
+    media_info["sweep"] = sweep
+    await searching.edit(content=sweep_content(sweep, groups, media_info["picked"]), view=SweepView(groups, media_info))
+
+def sweep_instances(app):
+    return {"radarr": radarr_instances, "sonarr": sonarr_instances}.get(app, radarr_instances + sonarr_instances)
+
+async def run_sweep(args):
+    start_trace("sweep")
+    for inst in arr_instances.values():
+        inst.queue.start()
+    try:
+        # Titles for the report come from the library index
+        await asyncio.gather(*(inst.refresh_index() for inst in arr_instances.values()))
+        sweep = await sweep_library(sweep_instances(args.app), SWEEP_REASONS if args.scope == "all" else (args.scope,))
+        groups = sweep.sorted_groups()
+        movies, episodes = sweep.totals()
+        print(f"Sweep: {movies} movie(s) and {episodes} episode(s) in {len(groups)} group(s)")
+        for group in groups:
+            print(f"  {group.label():<60} {group.summary()}")
+        for error in sweep.errors:
+            print(f"  incomplete: {error}")
+        if args.regrab and groups:
+            counts, _ = await regrab_sweep(groups, args.batch_size)
+            print(f"Regrab: {sweep_outcome(counts)}")
+    finally:
+        for inst in arr_instances.values():
+            await inst.queue.stop()
+        await close_http_sessions()
+        if library_snapshot:
+            library_snapshot.close()
+    return 1 if sweep.errors else 0
+
+def sweep_arguments(argv):
+    parser = argparse.ArgumentParser(prog="regrabarr.py sweep",
+                                     description="List monitored items that are missing, below cutoff or failed, and optionally search for them")
+    parser.add_argument("--scope", choices=("all",) + SWEEP_REASONS, default="all")
+    parser.add_argument("--app", choices=("all", "radarr", "sonarr"), default="all")
+    parser.add_argument("--regrab", action="store_true", help="start searches for everything found")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="items per search command")
+    return parser.parse_args(argv)
+
+# ------------- Config reload -------------
+# config.yml is polled rather than watched with inotify, which works the same on every host and in
+# Docker bind mounts. Settings are swapped in one go on the event loop; flows already running finish
+# with the instance objects they hold.
+class ConfigWatcher:
+    def __init__(self):
+        self.location = None
+        self.interval = 0
+        self.digest = None   # of the config that is running
+        self.pending = None  # a new digest seen once; applied when the next check sees it again
+        self.task = None
+
+    def watch(self, location, interval):
+        self.location, self.interval = location, interval
+        self.digest = self.read()[1]
+
+    def read(self):
+        with open(self.location, "rb") as f:
+            data = f.read()
+        return data, hashlib.sha256(data).hexdigest()
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logging.error(f"Config watcher: {e}")
+
+    async def check(self):
+        try:
+            data, digest = self.read()
+        except OSError:
+            return  # mid-rename, or an editor that deletes before writing; look again next time
+        if digest == self.digest:
+            self.pending = None
+            return
+        if digest != self.pending:
+            # Wait for the file to stop changing, so an editor that writes in several steps is never read half-way
+            self.pending = digest
+            return
+        self.pending = None
+        self.digest = digest  # a broken file is reported once, not on every check
+        await reload_config(data)
+
+config_watcher = ConfigWatcher()
+
+def normalize_config(cfg):
+    ensure_section(cfg, "bot")
+    for section in ("radarr", "sonarr"):
+        if not isinstance(cfg.get(section), list):
+            ensure_section(cfg, section)
+    return cfg
+
+def apply_settings():
+    # The settings in `config` that take effect without a restart, except the instances
+    global regrab_movie_command_name, regrab_episode_command_name, regrab_sweep_command_name
+    global lookup_cache_ttl, lookup_cache_size, episode_cache_ttl, episode_cache_size, webhook_config, metrics_config
+    regrab_movie_command_name = config["bot"].get("regrab_movie", "regrab_movie")
+    regrab_episode_command_name = config["bot"].get("regrab_episode", "regrab_episode")
+    regrab_sweep_command_name = config["bot"].get("regrab_sweep", "regrab_sweep")
+    lookup_cache_ttl = config["bot"].get("lookup_cache_ttl", DEFAULT_LOOKUP_CACHE_TTL)
+    lookup_cache_size = config["bot"].get("lookup_cache_size", DEFAULT_LOOKUP_CACHE_SIZE)
+    episode_cache_ttl = config["bot"].get("episode_cache_ttl", DEFAULT_EPISODE_CACHE_TTL)
+    episode_cache_size = config["bot"].get("episode_cache_size", DEFAULT_EPISODE_CACHE_SIZE)
+    webhook_config = config.get("webhook") or {}
+    metrics_config = config.get("metrics") or {}
+    webhook_server.token = webhook_config.get("token")
+
+def restart_needed(old, new):
+    def listener(cfg, section):
+        return {k: v for k, v in (cfg.get(section) or {}).items() if k != "token"}  # the webhook token is hot
+    changed = [f"bot.{key}" for key in RESTART_BOT_KEYS if old["bot"].get(key) != new["bot"].get(key)]
+    return changed + [section for section in ("webhook", "metrics") if listener(old, section) != listener(new, section)]
+
+def plan_instances(new):
+    # -> {app: [(name, cfg)]} and whether each app has several; raises ValueError on a config we can't run
+    plan, multiple, seen = {}, {}, set()
+    for app in ("radarr", "sonarr"):
+        plan[app], multiple[app] = instance_names(app, instance_configs(app, new))
+        for name, cfg in plan[app]:
+            if not isinstance(cfg, dict) or not cfg.get("url") or not cfg.get("api_key"):
+                raise ValueError(f"{name} needs a url and an api_key")
+            if name in seen:
+                raise ValueError("Radarr/Sonarr instance names must be unique")
+            seen.add(name)
+    return plan, multiple
+
+async def retire_instance(inst):
+    # Queued regrabs still finish; nothing new reaches the instance once it has left arr_instances
+    if inst.queue.queue is not None:
+        try:
+            await asyncio.wait_for(inst.queue.queue.join(), SESSION_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            logging.warning(f"{inst.name} still had regrabs running when it was removed")
+    await inst.stop()
+    await asyncio.sleep(SESSION_DRAIN_SECONDS)
+    await inst.close()
+    if inst.name not in arr_instances:  # a replacement under the same name keeps the label
+        ARR_CIRCUIT_STATE.remove(inst.name)
+
+async def reload_config(data):
+    global config
+    try:
+        new = normalize_config(yaml.safe_load(data) or {})
+        plan, multiple = plan_instances(new)
+    except (yaml.YAMLError, ValueError) as e:
+        logging.error(f"Not reloading {config_location}, keeping the running config: {e}")
+        return False
+    if new == config:
+        return True  # e.g. our own save_config() after discovery
+    old, old_commands = config, command_names()
+    if any(new["bot"].get(key) != old["bot"].get(key) for key in ("log_format", "log_level", "trace_sample_rate")):
+        configure_logging(new["bot"])
+
+    # Nothing below awaits, so no handler ever sees half of the old config and half of the new one
+    config = new
+    apply_settings()
+    apps = {"radarr": radarr_instances, "sonarr": sonarr_instances}
+    added, kept = [], {}
+    for app, named in plan.items():
+        for name, cfg in named:
+            inst = arr_instances.get(name)
+            if inst is not None and inst.app == app:
+                inst.configure(cfg, multiple[app])
+            else:
+                inst = ArrInstance(app, cfg, name, multiple[app])
+                added.append(inst)
+            kept[name] = inst
+        apps[app][:] = [kept[name] for name, _ in named]
+    removed = [inst for name, inst in arr_instances.items() if kept.get(name) is not inst]
+    arr_instances.clear()
+    arr_instances.update(kept)
+
+    for inst in added:
+        inst.start()
+    for inst in removed:
+        asyncio.ensure_future(retire_instance(inst))
+    if any(inst.needs_discovery() for inst in added):
+        asyncio.ensure_future(discover_instances())
+    changes = [f"+{inst.name}" for inst in added] + [f"-{inst.name}" for inst in removed]
+    logging.info(f"Reloaded {config_location}" + (f" ({', '.join(changes)})" if changes else ""))
+    restart = restart_needed(old, new)
+    if restart:
+        logging.warning(f"Changes to {', '.join(restart)} take effect after a restart")
+    if command_names() != old_commands:
+        register_commands(old_commands)
+        bot.commands_synced = False  # a reconnect syncs them if we aren't connected now
+        if bot.is_ready():
+            await bot.sync_commands()
+    if bot.is_ready():
+        await update_presence()
+    return True
+
+# ------------- Startup -------------
+def load_config(location):
+    global config_location, config, bot_token, library_snapshot, bot
+    config_location = location
+    config = normalize_config(get_config(location) or {})
+    setup_logging(config["bot"])
+
+    bot_token = config["bot"]["token"]
+    apply_settings()
+    config_watcher.watch(location, config["bot"].get("config_watch_seconds", CONFIG_WATCH_SECONDS))
+
+    radarr_instances[:] = build_instances("radarr", instance_configs("radarr"))
+    sonarr_instances[:] = build_instances("sonarr", instance_configs("sonarr"))
+    arr_instances.clear()
+    arr_instances.update((inst.name, inst) for inst in radarr_instances + sonarr_instances)
+    if len(arr_instances) != len(radarr_instances) + len(sonarr_instances):
+        logging.critical("Radarr/Sonarr instance names must be unique. Exiting.")
+        sys.exit(1)
+    # `snapshot: false` turns the warm-start store off
+    snapshot = config["bot"].get("snapshot", os.path.join(os.path.dirname(location) or ".", SNAPSHOT_FILE))
+    if snapshot:
+        library_snapshot = open_snapshot(snapshot, list(arr_instances.values()))
+    bot = build_bot(config["bot"])
+    register_commands()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    location = os.environ.get("REGRABARR_CONFIG", DEFAULT_CONFIG_LOCATION)
+    if argv[:1] == ["batch"]:
+        args = batch_arguments(argv[1:])
+        load_config(location)
+        sys.exit(asyncio.run(run_batch(args)))
+    if argv[:1] == ["sweep"]:
+        args = sweep_arguments(argv[1:])
+        load_config(location)
+        sys.exit(asyncio.run(run_sweep(args)))
+    load_config(location)
+    bot.run(bot_token, log_handler=None)  # discord.py logs through our handlers
 
 if __name__ == "__main__":
-    bot.run(bot_token)
+    main()
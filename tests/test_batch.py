@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import json
+
+import pytest
+
+import regrabarr as r
+from stub_arr import start_stub
+
+# Batch progress is checkpointed as each regrab job finishes, so a run that stops partway through a
+# window doesn't regrab what it already did when it resumes.
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    path = tmp_path / "lost.jsonl"
+    path.write_text("".join(json.dumps({"radarr_id": i}) + "\n" for i in range(1, 7)))
+
+    def run(test):
+        async def main():
+            runner, app, base_url = await start_stub(movies=10, series=1)
+            inst = r.ArrInstance("radarr", {"url": f"{base_url}/radarr/api/v3", "api_key": "k",
+                                            "qualityprofileid": 1, "root_path": "/media",
+                                            "regrab_concurrency": 1}, "radarr", False)
+            monkeypatch.setattr(r, "arr_instances", {"radarr": inst})
+            monkeypatch.setattr(r, "radarr_instances", [inst])
+            monkeypatch.setattr(r, "sonarr_instances", [])
+            monkeypatch.setattr(r, "library_snapshot", None)
+            args = argparse.Namespace(file=str(path), checkpoint=None, restart=False, report=None, batch_size=1,
+                                      window=r.DEFAULT_BATCH_WINDOW, concurrency=None, dry_run=False)
+            try:
+                await test(inst, app, args)
+            finally:
+                await inst.queue.stop()
+                await inst.close()
+                await runner.cleanup()
+        asyncio.run(main())
+    return run
+
+def searched(app):
+    return [c["body"]["movieIds"][0] for c in app["library"].commands.values() if c["name"] == "MoviesSearch"]
+
+def test_checkpoint_after_each_job_and_resume(batch, monkeypatch):
+    async def test(inst, app, args):
+        stuck = asyncio.Event()
+        regrab_movie_files = r.regrab_movie_files
+
+        async def hang_on_movie_4(inst, movies):
+            if movies[0].id == 4:
+                stuck.set()
+                await asyncio.Event().wait()  # the run is interrupted here
+            return await regrab_movie_files(inst, movies)
+        monkeypatch.setattr(r, "regrab_movie_files", hang_on_movie_4)
+
+        await inst.refresh_index()
+        inst.queue.start()
+        run = r.BatchRun(args)
+        window = asyncio.ensure_future(run.run_window(list(r.read_batch_rows(args.file))))
+        await stuck.wait()
+        await asyncio.sleep(0.05)
+        window.cancel()
+        await asyncio.gather(window, return_exceptions=True)
+        await inst.queue.stop()
+
+        with open(run.checkpoint_path) as f:
+            saved = json.load(f)
+        assert (saved["row"], saved["done"]) == (0, [1, 2, 3])
+        assert saved["counts"] == {"searching": 3}
+        assert searched(app) == [1, 2, 3]
+
+        monkeypatch.setattr(r, "regrab_movie_files", regrab_movie_files)
+        assert await r.run_batch(args) == 0
+        assert searched(app) == [1, 2, 3, 4, 5, 6]  # nothing regrabbed twice
+        with open(run.checkpoint_path) as f:
+            saved = json.load(f)
+        assert (saved["row"], saved["done"]) == (6, [])
+        assert saved["counts"] == {"searching": 6}
+    batch(test)
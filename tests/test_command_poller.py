@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+import regrabarr as r
+from fake_discord import FakeMessage
+from stub_arr import start_stub
+
+# A search command completes before what it grabbed shows up in /queue (the *arr only adds it on its
+# next tracked-download refresh); the poller must not call that "nothing found".
+
+TIMINGS = {"started": 0.05, "completed": 0.1, "queued": 0.5, "downloaded": 0.8}
+
+@pytest.fixture
+def poll(monkeypatch):
+    def run(grabs=True, until=1.2):
+        async def main():
+            runner, app, base_url = await start_stub(movies=10, series=1)
+            app["library"].timings = TIMINGS
+            app["library"].grabs = grabs
+            inst = r.ArrInstance("radarr", {"url": f"{base_url}/radarr/api/v3", "api_key": "k",
+                                            "qualityprofileid": 1, "root_path": "/media"}, "radarr", False)
+            monkeypatch.setattr(r, "arr_instances", {"radarr": inst})
+            try:
+                resp = await r.radarr_movies_search(inst, [5])
+                poller = r.CommandPoller({"radarr": inst})
+                poller.track(r.command_watch(inst, resp, [5]), FakeMessage(), "user", "Movie 5")
+                watch = next(iter(poller.watches.values()))
+                states = []
+                start = time.monotonic()
+                while poller.watches and time.monotonic() - start < until:
+                    await poller.poll_once()
+                    if not states or states[-1] != watch.state:
+                        states.append(watch.state)
+                    await asyncio.sleep(0.02)
+                return states
+            finally:
+                await inst.close()
+                await runner.cleanup()
+        return asyncio.run(main())
+    return run
+
+def test_grab_reaching_the_queue_after_the_search_completes(poll):
+    assert poll() == ["queued", "started", "grabbed", "completed"]
+
+def test_waits_for_the_queue_when_the_command_does_not_say_what_it_grabbed(poll, monkeypatch):
+    monkeypatch.setattr(r, "reports_downloaded", lambda command: None)
+    # completed search, empty queue for a while, then the grab: never not_found in between
+    assert poll() == ["queued", "started", "grabbed", "completed"]
+
+def test_search_that_downloaded_nothing_is_not_found(poll):
+    assert poll(grabs=False) == ["queued", "started", "not_found"]
+
+def test_not_found_only_after_the_grace_window(poll, monkeypatch):
+    monkeypatch.setattr(r, "reports_downloaded", lambda command: None)
+    monkeypatch.setattr(r, "QUEUE_GRACE", 0.3)
+    grace_start = []
+    real_set = r.CommandPoller._set
+    def record(self, watch, state, progress=None, detail=None):
+        if state == "not_found":
+            grace_start.append(time.monotonic() - watch.searched_at)
+        return real_set(self, watch, state, progress, detail)
+    monkeypatch.setattr(r.CommandPoller, "_set", record)
+    assert poll(grabs=False) == ["queued", "started", "not_found"]
+    assert grace_start[0] > 0.3
@@ -0,0 +1,50 @@
+import difflib
+
+import pytest
+
+import regrabarr as r
+from stub_arr import StubLibrary
+
+def movie(movie_id, title):
+    return r.MovieRecord(instance="radarr", id=movie_id, tmdb_id=1000 + movie_id, title=title, year=2000,
+                         title_slug="", overview=None, images=[], monitored=True, movie_file_id=None)
+
+@pytest.fixture(scope="module")
+def library():
+    movies = [r.MovieRecord.from_json("radarr", m) for m in StubLibrary(movies=3000, series=0).movies.values()]
+    index = r.LibraryIndex("radarr", "tmdb_id", None)
+    index.restore(movies)
+    return index
+
+def titles(items):
+    return [normalize for normalize in dict.fromkeys(r.normalize_title(i.title) for i in items)]
+
+@pytest.mark.parametrize("query", ["the", "dark n", "moon", "king ho", "ire", "r", "zz"])
+def test_prefix_and_word_matches_equal_a_full_scan(library, query):
+    # The trigram index only narrows what is scanned; the matches are the same as checking every title
+    q = r.normalize_title(query)
+    prefix = [k for k in library.sorted_titles if k.startswith(q)]
+    words = [k for k in library.sorted_titles if " " + q in " " + k and k not in prefix]
+    expected = (prefix + words)[:r.AUTOCOMPLETE_LIMIT]
+    found = titles(library.search(query, limit=10_000))[:len(expected)]
+    assert found == expected
+
+@pytest.mark.parametrize("query", ["drak nigth", "secert rivr", "gohst empir", "wintr kign"])
+def test_fuzzy_pass_finds_the_full_scans_best_match(library, query):
+    best = difflib.get_close_matches(r.normalize_title(query), library.sorted_titles, n=1, cutoff=0.6)
+    assert best and best[0] in titles(library.search(query))
+
+def test_fuzzy_pass_is_capped(library):
+    assert len(library.fuzzy_candidates("the dark the lost the")) <= r.FUZZY_CANDIDATES
+
+def test_trigrams_follow_upserts_and_removals():
+    index = r.LibraryIndex("radarr", "tmdb_id", None)
+    index.upsert(movie(1, "Amélie"))
+    index.upsert(movie(2, "The Matrix"))
+    assert titles(index.search("matrix")) == ["the matrix"]
+    index.upsert(movie(2, "The Matrix Reloaded"))  # renamed in Radarr
+    index.remove(1)
+    assert titles(index.search("matrix")) == ["the matrix reloaded"]
+    assert index.search("amelie") == []
+    assert all("the matrix" != key for keys in index.by_trigram.values() for key in keys)
+    assert all(keys for keys in index.by_trigram.values())
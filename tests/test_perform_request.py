@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import regrabarr as r
+
+# perform_request against a scripted server: which failures are retried, which are not, and how the
+# circuit breaker opens, probes and closes. Callers treat None as "didn't work" and check the breaker
+# to tell "unreachable" apart from other failures.
+
+class Script:
+    # Answers each request with the next status in the list (the last one repeats)
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.hits = []
+
+    async def handle(self, request):
+        self.hits.append(request.method)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return web.json_response({"ok": status < 400}, status=status)
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(r, "backoff_delay", lambda attempt: 0)
+    def run(script, test, retries=2, threshold=r.BREAKER_THRESHOLD, stopped=False):
+        async def main():
+            app = web.Application()
+            app.router.add_route("*", "/api/v3/{path:.*}", script.handle)
+            srv = TestServer(app)
+            await srv.start_server()
+            base_url = str(srv.make_url("/api/v3"))
+            if stopped:
+                await srv.close()  # nothing listens there any more
+            inst = r.ArrInstance("radarr", {"url": base_url, "api_key": "k", "retries": retries}, "radarr", False)
+            inst.breaker.threshold = threshold
+            try:
+                await test(inst, base_url)
+            finally:
+                await inst.close()
+                await srv.close()
+        asyncio.run(main())
+    return run
+
+def test_retries_a_5xx_until_it_succeeds(server):
+    script = Script(503, 502, 200)
+    async def test(inst, base_url):
+        resp = await r.perform_request(inst, "GET", f"{base_url}/movie")
+        assert resp.status_code == 200
+        assert script.hits == ["GET"] * 3
+        assert inst.breaker.state == "closed" and inst.breaker.failures == 0
+    server(script, test)
+
+def test_gives_up_after_the_configured_retries(server):
+    script = Script(503)
+    async def test(inst, base_url):
+        assert await r.perform_request(inst, "GET", f"{base_url}/movie") is None
+        assert len(script.hits) == 3
+    server(script, test, retries=2)
+
+def test_non_retryable_errors_are_not_repeated(server):
+    script = Script(500)
+    async def test(inst, base_url):
+        assert await r.perform_request(inst, "GET", f"{base_url}/movie") is None
+        assert len(script.hits) == 1
+        assert inst.breaker.failures == 1  # still a sign the instance is unwell
+    server(script, test)
+
+def test_client_errors_do_not_count_against_the_instance(server):
+    script = Script(404)
+    async def test(inst, base_url):
+        assert await r.perform_request(inst, "GET", f"{base_url}/movie/9") is None
+        assert len(script.hits) == 1
+        assert inst.breaker.failures == 0
+    server(script, test)
+
+def test_post_is_not_retried_once_it_reached_the_server(server):
+    script = Script(503, 200)
+    async def test(inst, base_url):
+        assert await r.perform_request(inst, "POST", f"{base_url}/command", data={"name": "MoviesSearch"}) is None
+        assert script.hits == ["POST"]
+    server(script, test)
+
+def test_post_is_retried_when_it_never_connected(server):
+    script = Script(200)
+    async def test(inst, base_url):
+        assert await r.perform_request(inst, "POST", f"{base_url}/command", data={"name": "MoviesSearch"}) is None
+        assert inst.breaker.failures == 3  # every attempt was made
+        assert script.hits == []
+    server(script, test, stopped=True)
+
+def test_delete_404_after_a_failed_attempt_counts_as_done(server):
+    script = Script(503, 404)
+    async def test(inst, base_url):
+        resp = await r.perform_request(inst, "DELETE", f"{base_url}/moviefile/bulk")
+        assert resp.status_code == 200
+        assert script.hits == ["DELETE", "DELETE"]
+    server(script, test)
+
+def test_breaker_opens_probes_and_closes(server):
+    script = Script(503, 503, 503, 503, 200)
+    async def test(inst, base_url):
+        breaker = inst.breaker
+        breaker.reset_after = 0.1
+        for _ in range(3):
+            assert await r.perform_request(inst, "GET", f"{base_url}/movie") is None
+        assert breaker.state == "open"
+        # Open: fails fast without touching the server
+        assert await r.perform_request(inst, "GET", f"{base_url}/movie") is None
+        assert len(script.hits) == 3
+        await asyncio.sleep(0.15)
+        # Half-open: one probe goes through; it fails, so the breaker opens again
+        assert await r.perform_request(inst, "GET", f"{base_url}/movie") is None
+        assert len(script.hits) == 4 and breaker.state == "open"
+        await asyncio.sleep(0.15)
+        # The next probe succeeds and closes it
+        resp = await r.perform_request(inst, "GET", f"{base_url}/movie")
+        assert resp.status_code == 200 and breaker.state == "closed"
+    server(script, test, retries=0, threshold=3)
+
+def test_half_open_lets_one_probe_through_at_a_time():
+    breaker = r.CircuitBreaker("radarr", threshold=1, reset_after=0.05)
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # a second caller waits for the probe's outcome
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_jobs_report_unreachable_while_the_breaker_is_open(server):
+    script = Script(503)
+    async def test(inst, base_url):
+        assert await r.perform_request(inst, "GET", f"{base_url}/movie") is None
+        assert inst.breaker.is_open()
+        assert r.unreachable([inst]) == ["radarr"]
+        assert await r.regrab_movie_job(inst, None) == (False, "unreachable", None)
+        assert await r.regrab_episodes_job(inst, []) == (False, "unreachable", None)
+        assert await r.sweep_search_job(inst, []) == (False, "unreachable", None)
+        assert str(r.batch_missing(inst)) == "unreachable"
+        assert len(script.hits) == 1  # none of them reached the server
+    server(script, test, retries=0, threshold=1)
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import regrabarr as r
+from stub_arr import start_stub
+
+# Against the stub Radarr: in search mode a movie Radarr already has keeps its entry (tags, profile,
+# history); only its file is swapped, and an unmonitored movie is monitored first.
+
+UNMONITORED = 31  # the stub leaves every 31st movie unmonitored
+
+@pytest.fixture
+def radarr(monkeypatch):
+    def run(test):
+        async def main():
+            runner, app, base_url = await start_stub(movies=40, series=1)
+            inst = r.ArrInstance("radarr", {"url": f"{base_url}/radarr/api/v3", "api_key": "k",
+                                            "qualityprofileid": 1, "root_path": "/media"}, "radarr", False)
+            monkeypatch.setattr(r, "arr_instances", {"radarr": inst})
+            try:
+                await test(inst, app)
+            finally:
+                await inst.close()
+                await runner.cleanup()
+        asyncio.run(main())
+    return run
+
+def lookup(app, movie_id):
+    return r.MovieRecord.from_json("radarr", dict(app["library"].movies[movie_id], id=None))
+
+def searched(app):
+    return [c["body"]["movieIds"] for c in app["library"].commands.values() if c["name"] == "MoviesSearch"]
+
+def test_monitored_movie_swaps_only_the_file(radarr):
+    async def test(inst, app):
+        ok, status, _ = await r.regrab_movie_job(inst, lookup(app, 5))
+        assert (ok, status) == (True, "searching")
+        assert app["stats"]["deleted"]["moviefile"] == {50005}
+        assert app["stats"]["deleted"]["movie"] == set()
+        assert searched(app) == [[5]]
+    radarr(test)
+
+def test_unmonitored_movie_is_monitored_and_searched_in_place(radarr):
+    async def test(inst, app):
+        assert not app["library"].movies[UNMONITORED]["monitored"]
+        ok, status, _ = await r.regrab_movie_job(inst, lookup(app, UNMONITORED))
+        assert (ok, status) == (True, "monitored")
+        assert app["library"].movies[UNMONITORED]["monitored"]
+        assert app["stats"]["deleted"]["movie"] == set()  # never re-added
+        assert app["stats"]["deleted"]["moviefile"] == {50000 + UNMONITORED}
+        assert searched(app) == [[UNMONITORED]]
+    radarr(test)
+
+def test_failing_to_monitor_leaves_the_movie_untouched(radarr, monkeypatch):
+    async def test(inst, app):
+        async def refuse(inst, movie_ids):
+            return None
+        monkeypatch.setattr(r, "radarr_monitor_movies", refuse)
+        ok, status, _ = await r.regrab_movie_job(inst, lookup(app, UNMONITORED))
+        assert (ok, status) == (False, "monitor_failed")
+        assert app["stats"]["deleted"] == {"movie": set(), "moviefile": set(), "episodefile": set()}
+        assert searched(app) == []
+    radarr(test)
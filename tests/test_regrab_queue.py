@@ -0,0 +1,119 @@
+import asyncio
+
+import regrabarr as r
+
+# The queue decides whether a destructive delete runs twice: a key in flight is merged into the running
+# job, and only a successful job starts the cooldown.
+
+class Job:
+    def __init__(self, result=(True, "searching", None), gate=True):
+        self.calls = []
+        self.result = result
+        self.gate = asyncio.Event()
+        if gate:
+            self.gate.set()
+
+    async def __call__(self, keys):
+        self.calls.append(list(keys))
+        await self.gate.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+def run(test, cooldown=600, concurrency=2):
+    async def main():
+        queue = r.RegrabQueue("radarr", concurrency, 0, cooldown)
+        queue.start()
+        try:
+            await test(queue)
+        finally:
+            await queue.stop()
+    asyncio.run(main())
+
+def test_merged_key_waits_on_the_running_job():
+    async def test(queue):
+        job, other = Job(gate=False), Job()
+        first = queue.submit([("movie", 1)], job)
+        await asyncio.sleep(0)
+        second = queue.submit([("movie", 1)], other)
+        assert second.merged == [("movie", 1)] and not second.fresh
+        assert second.futures == first.futures
+        waiting = asyncio.ensure_future(second.wait())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        job.gate.set()
+        assert await waiting == [(True, "searching", None)]
+        assert job.calls == [[("movie", 1)]] and other.calls == []
+    run(test)
+
+def test_only_keys_nobody_handles_are_queued():
+    async def test(queue):
+        running = Job(gate=False)
+        queue.submit([("episode", 1)], running)
+        job = Job()
+        ticket = queue.submit([("episode", 1), ("episode", 2), ("episode", 2)], job)
+        assert ticket.merged == [("episode", 1)] and ticket.fresh == [("episode", 2)]
+        running.gate.set()
+        await ticket.wait()
+        assert job.calls == [[("episode", 2)]]
+    run(test)
+
+def test_success_starts_the_cooldown():
+    async def test(queue):
+        await queue.submit([("movie", 1)], Job()).wait()
+        again = Job()
+        ticket = queue.submit([("movie", 1)], again)
+        assert ticket.cooling == [("movie", 1)] and not ticket.futures
+        assert 0 < queue.cooldown_remaining(("movie", 1)) <= 600
+        assert again.calls == []
+    run(test)
+
+def test_no_cooldown_after_a_failed_job():
+    async def test(queue):
+        for result in ((False, "delete_failed", None), RuntimeError("boom")):
+            outcome = await queue.submit([("movie", 1)], Job(result)).wait()
+            assert not outcome[0][0]
+            assert queue.cooldown_remaining(("movie", 1)) == 0
+            assert ("movie", 1) not in queue.inflight
+        retry = Job()
+        ticket = queue.submit([("movie", 1)], retry)
+        assert ticket.fresh == [("movie", 1)]
+        await ticket.wait()
+        assert retry.calls == [[("movie", 1)]]
+    run(test)
+
+def test_cooldown_expires():
+    async def test(queue):
+        await queue.submit([("movie", 1)], Job()).wait()
+        await asyncio.sleep(0.06)
+        assert queue.submit([("movie", 1)], Job()).fresh == [("movie", 1)]
+    run(test, cooldown=0.05)
+
+def test_cancelled_waiter_does_not_cancel_the_job():
+    async def test(queue):
+        job = Job(gate=False)
+        ticket = queue.submit([("movie", 1)], job)
+        waiter = asyncio.ensure_future(ticket.wait())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        job.gate.set()
+        assert await asyncio.wait_for(asyncio.shield(ticket.futures[0]), 1) == (True, "searching", None)
+    run(test)
+
+def test_stop_fails_the_jobs_still_queued():
+    async def main():
+        queue = r.RegrabQueue("radarr", 1, 0, 600)
+        queue.start()
+        running, queued = Job(gate=False), Job()
+        queue.submit([("movie", 1)], running)
+        ticket = queue.submit([("movie", 2)], queued)
+        await asyncio.sleep(0)
+        await queue.stop()
+        assert await ticket.wait() == [(False, "error", None)]
+        assert queued.calls == [] and queue.inflight == {}
+        queue.start()  # nothing merges into the job that never ran
+        try:
+            assert queue.submit([("movie", 2)], queued).fresh == [("movie", 2)]
+        finally:
+            await queue.stop()
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+import discord
+from discord import app_commands
+from prometheus_client import REGISTRY
+
+import regrabarr as r
+
+# What a config reload or a restart must leave alone: the circuit gauge of an instance replaced under
+# the same name, the logging listener thread, and Discord's commands when they haven't changed.
+
+def circuit_state(name):
+    return REGISTRY.get_sample_value("regrabarr_upstream_circuit_state", {"app": name})
+
+def instance(name, app):
+    return r.ArrInstance(app, {"url": f"http://{name}", "api_key": "k"}, name, False)
+
+def test_retired_instance_keeps_the_label_of_its_replacement(monkeypatch):
+    monkeypatch.setattr(r, "SESSION_DRAIN_SECONDS", 0)
+    async def main():
+        old, other = instance("media", "radarr"), instance("gone", "radarr")
+        replacement = instance("media", "sonarr")  # same name, different app: a new instance
+        monkeypatch.setattr(r, "arr_instances", {"media": replacement})
+        await asyncio.gather(r.retire_instance(old), r.retire_instance(other))
+    asyncio.run(main())
+    assert circuit_state("media") == 0
+    assert circuit_state("gone") is None
+
+def test_reload_changes_logging_without_restarting_the_listener(monkeypatch):
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", list(root.handlers))
+    monkeypatch.setattr(root, "level", root.level)
+    monkeypatch.setattr(r, "trace_sample_rate", r.trace_sample_rate)
+    r.setup_logging({"log_level": "info"})
+    try:
+        listener = r.log_listener
+        r.configure_logging({"log_level": "debug", "log_format": "text", "trace_sample_rate": 0.5})
+        assert r.log_listener is listener and listener._thread.is_alive()
+        assert root.level == logging.DEBUG and r.trace_sample_rate == 0.5
+        assert isinstance(listener.handlers[0].formatter, r.TextFormatter)
+    finally:
+        r.stop_logging()
+
+def test_restart_only_syncs_commands_that_changed(tmp_path, monkeypatch):
+    snapshot = r.LibrarySnapshot(str(tmp_path / "regrabarr.db"))
+    monkeypatch.setattr(r, "library_snapshot", snapshot)
+    syncs = []
+
+    async def start(description):
+        # A fresh process: a new bot, its tree built from the config
+        bot = r.RegrabBot(command_prefix="!", intents=discord.Intents.none())
+        async def regrab(interaction: discord.Interaction):
+            pass
+        bot.tree.add_command(app_commands.command(name="regrab_movie", description=description)(regrab))
+        async def sync():
+            syncs.append(description)
+            return bot.tree.get_commands()
+        monkeypatch.setattr(bot.tree, "sync", sync)
+        await bot.sync_commands()
+        assert bot.commands_synced
+
+    try:
+        asyncio.run(start("Delete and redownload the selected movie"))
+        asyncio.run(start("Delete and redownload the selected movie"))
+        asyncio.run(start("Redownload the selected movie"))
+    finally:
+        snapshot.close()
+    assert syncs == ["Delete and redownload the selected movie", "Redownload the selected movie"]
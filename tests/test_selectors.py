@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+import regrabarr as r
+from fake_discord import FakeInteraction, FakeMessage, FakeUser, select
+
+# Discord drops a component interaction that isn't acknowledged within 3s, so selectors that
+# wait on Radarr/Sonarr must answer before the first upstream call.
+
+def series(series_id=None):
+    return r.SeriesRecord(instance="sonarr", id=series_id, tvdb_id=81189, title="Show", year=2008,
+                          title_slug="show", overview=None, images=[], monitored=True, seasons=[0, 1, 2])
+
+@pytest.fixture
+def sonarr(monkeypatch):
+    instances = {}
+    monkeypatch.setattr(r, "arr_instances", instances)
+
+    def make():
+        instances["sonarr"] = r.ArrInstance("sonarr", {"url": "http://sonarr", "api_key": "k"}, "sonarr", False)
+        return instances["sonarr"]
+    return make
+
+def component(view):
+    ctx = FakeInteraction(FakeUser("user"))
+    message = FakeMessage("menu", view)
+    return ctx.component(message), message
+
+def test_series_selector_acknowledges_before_discovery(sonarr, monkeypatch):
+    async def main():
+        inst = sonarr()
+        view = r.SeriesSelectorView([series()], {})
+        interaction, message = component(view)
+
+        async def slow_discovery():
+            assert interaction.response.done
+            return False
+        monkeypatch.setattr(inst, "ensure_discovered", slow_discovery)
+        await select(view, 0).callback(interaction)
+        assert message.content.startswith("Still connecting")
+        assert message.view is None
+    asyncio.run(main())
+
+def test_series_selector_acknowledges_before_adding(sonarr, monkeypatch):
+    async def main():
+        inst = sonarr()
+        inst.quality_profile_id, inst.root_folder_path = 1, "/tv"
+        view = r.SeriesSelectorView([series()], {})
+        interaction, message = component(view)
+
+        async def add_series(inst, **kwargs):
+            assert interaction.response.done
+            return None
+        monkeypatch.setattr(r, "sonarr_add_series", add_series)
+        await select(view, 0).callback(interaction)
+        assert message.content.startswith("Failed to add series")
+        assert message.view is view  # still there to pick again
+    asyncio.run(main())
+
+def test_series_selector_shows_seasons(sonarr):
+    async def main():
+        inst = sonarr()
+        media_info = {}
+        view = r.SeriesSelectorView([series(7)], media_info)
+        interaction, message = component(view)
+        await select(view, 0).callback(interaction)
+        assert message.content == "Please select a season"
+        assert [o.label for o in message.view.children[0].options] == ["Season 1", "Season 2"]
+        assert media_info["series"].id == 7
+        # The season menu prefetches episodes in the background
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await inst.close()
+    asyncio.run(main())
+
+def episode(number):
+    return r.EpisodeRecord(id=number, series_id=7, season_number=1, episode_number=number, title=f"Episode {number}",
+                           overview=None, air_date="2001-01-01", episode_file_id=100 + number)
+
+def test_season_selector_acknowledges_before_fetching_episodes(sonarr, monkeypatch):
+    async def main():
+        media_info = {"instance": sonarr(), "series": series(7)}
+        view = r.SeasonSelectorView([1, 2], media_info)
+        interaction, message = component(view)
+
+        async def fetch_episodes(inst, series_id, season_number):
+            assert interaction.response.done
+            return [episode(1), episode(2)]
+        monkeypatch.setattr(r, "fetch_episodes", fetch_episodes)
+        await select(view, 0).callback(interaction)
+        assert message.content == "Please select an episode"
+        assert media_info["seasonNumber"] == 1
+    asyncio.run(main())
+
+def test_season_selector_without_aired_episodes(sonarr, monkeypatch):
+    async def main():
+        view = r.SeasonSelectorView([1], {"instance": sonarr(), "series": series(7)})
+        interaction, message = component(view)
+
+        async def fetch_episodes(inst, series_id, season_number):
+            return []
+        monkeypatch.setattr(r, "fetch_episodes", fetch_episodes)
+        await select(view, 0).callback(interaction)
+        assert message.content.startswith("No aired episodes")
+        assert message.view is None
+    asyncio.run(main())
+
+def test_confirm_acknowledges_before_regrabbing(sonarr, monkeypatch):
+    async def main():
+        media_info = {"instance": sonarr(), "series": series(7), "seasonNumber": 1, "episodes": [episode(1)]}
+        ctx = FakeInteraction(FakeUser("user"))
+        view = r.ConfirmButtonsSeries(ctx, media_info)
+        interaction, _ = component(view)
+        regrabbed = []
+
+        async def run_regrab(queue, keys, run, *args):
+            assert interaction.response.done
+            regrabbed.extend(keys)
+        monkeypatch.setattr(r, "run_regrab", run_regrab)
+        await next(b for b in view.children if b.label == "Regrab").callback(interaction)
+        assert regrabbed == [("episode", 1)]
+    asyncio.run(main())
+
+def test_sweep_regrab_acknowledges_before_searching(sonarr, monkeypatch):
+    async def main():
+        group = r.SweepGroup(sonarr(), series_id=7, season=1)
+        group.add(episode(1), "missing")
+        view = r.SweepView([group], {"picked": set(), "interaction": FakeInteraction(FakeUser("admin"))})
+        interaction, _ = component(view)
+
+        async def regrab_sweep(groups, batch_size=r.DEFAULT_BATCH_SIZE):
+            assert interaction.response.done
+            return {"search_started": 1}, []
+        monkeypatch.setattr(r, "regrab_sweep", regrab_sweep)
+        await next(b for b in view.children if getattr(b, "label", "").startswith("Regrab all")).callback(interaction)
+        assert interaction.channel.sent[-1].content.endswith("1 search started.")
+    asyncio.run(main())
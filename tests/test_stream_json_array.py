@@ -0,0 +1,75 @@
+import json
+import asyncio
+
+import pytest
+
+import regrabarr as r
+
+DOCUMENTS = [
+    "[]",
+    " [ ] ",
+    "[1, 2.5]",
+    "[-3e10]",
+    "[0, -0.5e-3, 12345678901234567890, 1E+2, true, false, null]",
+    '[{"id": 1, "title": "A, B ] C", "nested": {"list": [1, [2, {}]], "s": "\\"quoted\\""}}, "x"]',
+    '[\n  {"title": "Amélie", "year": 2001},\n  {"title": "千と千尋の神隠し"},\n  "🎬 \\u00e9",\n  3.14\n]\n',
+]
+
+class FakeStream:
+    # aiohttp's StreamReader.read(n), handing out the body in the given pieces; b"" only at the end
+    def __init__(self, data, sizes):
+        self.data = data
+        self.sizes = list(sizes)
+        self.pos = 0
+
+    async def read(self, n):
+        size = self.sizes.pop(0) if self.sizes else n
+        chunk = self.data[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return chunk
+
+def parse(data, sizes=()):
+    async def main():
+        return [item async for item in r.stream_json_array(FakeStream(data, sizes), chunk_size=len(data) + 1)]
+    return asyncio.run(main())
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+def test_every_split_point(doc):
+    data = doc.encode()
+    expected = json.loads(doc)
+    for split in range(1, len(data)):
+        assert parse(data, [split, len(data)]) == expected, f"split at byte {split}"
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_small_chunks(doc, size):
+    data = doc.encode()
+    assert parse(data, [size] * len(data)) == json.loads(doc)
+
+def test_number_cut_after_a_valid_prefix():
+    # "2" of "2.5" and "-3" of "-3e10" decode on their own
+    assert parse(b"[1, 2.5]", [6, 2]) == [1, 2.5]
+    assert parse(b"[-3e10]", [3, 4]) == [-3e10]
+
+def test_multibyte_characters_split_mid_sequence():
+    data = '["é", "日本", "🎬"]'.encode()
+    for split in range(1, len(data)):
+        assert parse(data, [split, len(data)]) == ["é", "日本", "🎬"]
+
+@pytest.mark.parametrize("doc", DOCUMENTS)
+def test_truncated_body_raises(doc):
+    data = doc.rstrip().encode()
+    for end in range(len(data)):
+        with pytest.raises(ValueError):
+            parse(data[:end], [3] * len(data))
+
+@pytest.mark.parametrize("body", [b"", b"   ", b'{"message": "Unauthorized"}', b'"text"', b"42", b"null",
+                                  b"<html>502 Bad Gateway</html>"])
+def test_non_array_body_raises(body):
+    with pytest.raises(ValueError):
+        parse(body, [2] * len(body))
+
+@pytest.mark.parametrize("body", [b"[1x]", b"[1, tru]", b'[{"a": 1]', b"[1.]"])
+def test_malformed_item_raises(body):
+    with pytest.raises(ValueError):
+        parse(body)
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+import regrabarr as r
+from fake_discord import FakeMessage
+from stub_arr import start_stub
+
+# Sweep searches share each instance's regrab queue, so a user's regrab can end up following a sweep
+# job (and the other way round). The user must be told what actually happened to their item.
+
+def episode(number):
+    return r.EpisodeRecord(id=number, series_id=1, season_number=1, episode_number=number, title=f"Episode {number}",
+                           overview=None, air_date="2001-01-01", episode_file_id=900000 + number)
+
+@pytest.fixture
+def sonarr(monkeypatch):
+    def run(test):
+        async def main():
+            runner, app, base_url = await start_stub(movies=1, series=2)
+            inst = r.ArrInstance("sonarr", {"url": f"{base_url}/sonarr/api/v3", "api_key": "k"}, "sonarr", False)
+            monkeypatch.setattr(r, "arr_instances", {"sonarr": inst})
+            monkeypatch.setattr(r, "command_poller", r.CommandPoller({"sonarr": inst}))
+            inst.queue.start()
+            try:
+                await test(inst, app)
+            finally:
+                await inst.queue.stop()
+                await inst.close()
+                await runner.cleanup()
+        asyncio.run(main())
+    return run
+
+def test_episode_regrab_merged_into_a_sweep_job(sonarr):
+    async def test(inst, app):
+        group = r.SweepGroup(inst, series_id=1, season=1)
+        group.add(episode(1), "missing")
+        group.add(episode(2), "missing")
+        sweep = asyncio.ensure_future(r.regrab_sweep([group]))
+        await asyncio.sleep(0)  # the sweep job is queued
+        status_msg = FakeMessage()
+        await r.run_regrab(inst.queue, [("episode", 2)],
+                           lambda keys: r.regrab_episodes_job(inst, [episode(2)]),
+                           status_msg, "user", "**Episode 2**", r.EPISODE_MESSAGES)
+        assert status_msg.history[1] == r.MERGED_MESSAGE.format(user="user", label="**Episode 2**")
+        assert status_msg.content == r.SWEEP_MERGED_MESSAGE.format(user="user", label="**Episode 2**")
+        assert app["stats"]["deleted"]["episodefile"] == set()  # the sweep job ran; nothing was deleted
+        counts, watches = await sweep
+        assert counts == {"search_started": 2} and len(watches) == 1
+    sonarr(test)
+
+def test_sweep_merged_into_a_user_regrab(sonarr):
+    async def test(inst, app):
+        status_msg = FakeMessage()
+        regrab = asyncio.ensure_future(r.run_regrab(
+            inst.queue, [("episode", 2)], lambda keys: r.regrab_episodes_job(inst, [episode(2)]),
+            status_msg, "user", "**Episode 2**", r.EPISODE_MESSAGES))
+        await asyncio.sleep(0)
+        group = r.SweepGroup(inst, series_id=1, season=1)
+        group.add(episode(1), "missing")
+        group.add(episode(2), "missing")
+        counts, _ = await r.regrab_sweep([group])
+        await regrab
+        assert status_msg.content == r.EPISODE_MESSAGES["regrabbing"].format(user="user", label="**Episode 2**")
+        assert sum(counts.values()) == 2
+        assert app["stats"]["deleted"]["episodefile"] == {900002}  # only the user's regrab deletes
+    sonarr(test)
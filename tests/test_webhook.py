@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import regrabarr as r
+from stub_arr import StubLibrary, webhook_payload, send_webhook
+from fake_discord import FakeMessage
+
+TOKEN = "secret"
+
+@pytest.fixture
+def library():
+    return StubLibrary(movies=5, series=2)
+
+@pytest.fixture
+def webhook(monkeypatch):
+    # Runs each test against a fresh radarr + sonarr behind the bot's real webhook route
+    def run(test):
+        async def main():
+            instances = {app: r.ArrInstance(app, {"url": f"http://{app}", "api_key": "k"}, app, False)
+                         for app in ("radarr", "sonarr")}
+            monkeypatch.setattr(r.webhook_server, "token", TOKEN)
+            monkeypatch.setattr(r.command_poller, "watches", {})
+            monkeypatch.setattr(r, "arr_instances", instances)
+            monkeypatch.setattr(r.command_poller, "instances", instances)
+            app = web.Application()
+            r.webhook_server.add_routes(app)
+            server = TestServer(app)
+            await server.start_server()
+            try:
+                await test(lambda path: str(server.make_url(path)))
+            finally:
+                await server.close()
+        asyncio.run(main())
+    return run
+
+def track(app, item_ids):
+    message = FakeMessage("queued")
+    r.command_poller.track({"app": app, "command_id": None, "item_ids": item_ids}, message, "user", "Item")
+    return message, next(iter(r.command_poller.watches.values()))
+
+def test_grab_then_download_completes_movie(webhook, library):
+    async def test(url):
+        message, watch = track("radarr", [3])
+        assert await send_webhook(url("/webhook/radarr"), webhook_payload(library, "radarr", "Grab", [3]), TOKEN) == 200
+        assert watch.state == "grabbed"
+        assert await send_webhook(url("/webhook/radarr"), webhook_payload(library, "radarr", "Download", [3]), TOKEN) == 200
+        assert watch.state == "completed"
+        assert r.command_poller.watches == {}
+        assert message.history[-1] == watch.render("user", "Item")
+    webhook(test)
+
+def test_episodes_complete_only_once_all_are_imported(webhook, library):
+    async def test(url):
+        _, watch = track("sonarr", [1, 2])
+        await send_webhook(url("/webhook/sonarr"), webhook_payload(library, "sonarr", "Download", [1]), TOKEN)
+        assert watch.state != "completed"
+        await send_webhook(url("/webhook/sonarr"), webhook_payload(library, "sonarr", "Download", [2]), TOKEN)
+        assert watch.state == "completed"
+    webhook(test)
+
+def test_import_failed_marks_watch_failed(webhook, library):
+    async def test(url):
+        _, watch = track("sonarr", [4])
+        await send_webhook(url("/webhook/sonarr"), webhook_payload(library, "sonarr", "ImportFailed", [4]), TOKEN)
+        assert watch.state == "failed"
+        assert "stub failure" in watch.detail
+    webhook(test)
+
+def test_other_items_and_events_are_ignored(webhook, library):
+    async def test(url):
+        _, watch = track("radarr", [1])
+        await send_webhook(url("/webhook/radarr"), webhook_payload(library, "radarr", "Grab", [2]), TOKEN)
+        await send_webhook(url("/webhook/radarr"), webhook_payload(library, "radarr", "Test", [1]), TOKEN)
+        assert watch.state == "started"
+    webhook(test)
+
+@pytest.mark.parametrize("body", [[{"eventType": "Grab"}], "Grab", 42, None])
+def test_non_object_body_is_rejected(webhook, body):
+    async def test(url):
+        assert await send_webhook(url("/webhook/radarr"), body, TOKEN) == 400
+    webhook(test)
+
+def test_unshaped_payload_matches_nothing(webhook):
+    async def test(url):
+        _, watch = track("sonarr", [1])
+        for payload in ({"eventType": "Grab", "episodes": "1"}, {"eventType": "Grab", "episodes": [1, None]}):
+            assert await send_webhook(url("/webhook/sonarr"), payload, TOKEN) == 200
+        assert watch.state == "started"
+    webhook(test)
+
+def test_auth_and_unknown_instance(webhook, library):
+    async def test(url):
+        payload = webhook_payload(library, "radarr", "Grab", [1])
+        assert await send_webhook(url("/webhook/radarr"), payload, "wrong") == 401
+        assert await send_webhook(url(f"/webhook/radarr?token={TOKEN}"), payload) == 200
+        assert await send_webhook(url("/webhook/lidarr"), payload, TOKEN) == 404
+    webhook(test)